@@ -0,0 +1,132 @@
+"""Пакетное создание постов и комментариев.
+
+Каждый элемент проверяется той же формой, что и HTML-страницы
+(PostForm, CommentForm), прошедшие проверку вставляются одним
+bulk_create в одной транзакции. bulk_create не отправляет сигналы,
+поэтому их работа — счетчики, ленты подписок, сброс кэша — делается
+одним проходом на весь пакет (для постов — posts.bulk). Поиск
+обновляют триггеры SQLite.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Max
+
+from core import page_cache
+from posts import bulk, counters
+from posts.cache import bump_generation
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Post
+
+NOT_AN_OBJECT = {'__all__': [{'message': 'Ожидается объект',
+                              'code': 'invalid'}]}
+POST_NOT_FOUND = {'post': [{'message': 'Пост не найден',
+                            'code': 'invalid'}]}
+POST_ID_REQUIRED = {'post': [{'message': 'Ожидается id поста',
+                              'code': 'invalid'}]}
+
+
+def assign_ids(model, objects):
+    """Проставляет id после bulk_create, если база их не вернула.
+
+    SQLite их не возвращает. Но внутри транзакции после первой вставки
+    писать в базу может только она, а AUTOINCREMENT выдает id подряд:
+    новые строки — это последние len(objects) id таблицы.
+    """
+    if not objects or objects[0].pk is not None:
+        return
+    last = model.objects.aggregate(last=Max('id'))['last']
+    for number, obj in enumerate(objects, last - len(objects) + 1):
+        obj.pk = number
+
+
+def parse_id(value):
+    """id из JSON: целое число или строка из цифр, как в формах.
+
+    true и false — тоже int в Python, но не id."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    return None
+
+
+def validate(items, make_form):
+    """Формы по элементам: `(valid, errors)`, где valid — пары
+    `(номер, форма)`, а errors — `{номер: ошибки}`."""
+    valid = []
+    errors = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = NOT_AN_OBJECT
+            continue
+        form = make_form(item)
+        if form.is_valid():
+            valid.append((index, form))
+        else:
+            errors[index] = form.errors.get_json_data()
+    return valid, errors
+
+
+def results(count, created, errors):
+    """Итог по каждому элементу в порядке запроса."""
+    return [
+        {'index': index, 'status': 'created', 'id': created[index].pk}
+        if index in created else
+        {'index': index, 'status': 'invalid', 'errors': errors[index]}
+        for index in range(count)
+    ]
+
+
+def create_posts(user, items):
+    # Элементы приходят в JSON, без файлов: картинок у таких постов нет
+    valid, errors = validate(items, lambda item: PostForm(item))
+    created = {}
+    for index, form in valid:
+        post = form.save(commit=False)
+        post.author = user
+        created[index] = post
+    posts = list(created.values())
+    if posts:
+        with transaction.atomic():
+            Post.objects.bulk_create(posts)
+            assign_ids(Post, posts)
+            bulk.posts_created(posts)
+    return results(len(items), created, errors)
+
+
+def create_comments(user, items):
+    post_ids = {
+        index: parse_id(item.get('post'))
+        for index, item in enumerate(items) if isinstance(item, dict)
+    }
+    existing = set(Post.objects.filter(
+        pk__in={pk for pk in post_ids.values() if pk is not None},
+    ).values_list('id', flat=True))
+    valid, errors = validate(items, lambda item: CommentForm(item))
+    created = {}
+    for index, form in valid:
+        if post_ids[index] is None:
+            errors[index] = POST_ID_REQUIRED
+            continue
+        if post_ids[index] not in existing:
+            errors[index] = POST_NOT_FOUND
+            continue
+        comment = form.save(commit=False)
+        comment.post_id = post_ids[index]
+        comment.author = user
+        created[index] = comment
+    comments = list(created.values())
+    if comments:
+        per_post = Counter(comment.post_id for comment in comments)
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            assign_ids(Comment, comments)
+            for post_id, count in per_post.items():
+                counters.change(counters.POST_COMMENTS, post_id, count)
+        bump_generation()
+        page_cache.purge(*(page_cache.page_path('posts:post_detail', post_id)
+                           for post_id in per_post))
+    return results(len(items), created, errors)
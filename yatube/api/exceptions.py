@@ -0,0 +1,6 @@
+class BadRequest(Exception):
+    """Запрос неправильной формы: неизвестные поля, limit, тело пакета.
+
+    json_errors отвечает на нее 400 с текстом исключения; остальные
+    исключения — ошибки сервера, а не клиента.
+    """
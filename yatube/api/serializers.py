@@ -0,0 +1,83 @@
+"""Сериализация постов для JSON API.
+
+Поля ответа выбираются параметром `fields`. Из базы читаются только
+колонки выбранных полей, автор и группа приходят тем же запросом через
+JOIN, поэтому страница ленты — один запрос, сколько бы постов в ней ни
+было (и еще один на счетчики комментариев, если они запрошены).
+"""
+from itertools import chain
+
+from .exceptions import BadRequest
+
+# Поле ответа -> колонки, которые для него нужны
+POST_FIELDS = {
+    'id': ('id',),
+    'text': ('text',),
+    'pub_date': ('pub_date',),
+    'author': ('author__username', 'author__first_name',
+               'author__last_name'),
+    'group': ('group__slug', 'group__title'),
+    'image': ('image',),
+    'comments_count': (),
+}
+RELATED_FIELDS = ('author', 'group')
+# Ключ сортировки лент: нужен курсору при любом наборе полей
+CURSOR_COLUMNS = ('id', 'pub_date')
+
+
+def parse_fields(value):
+    if not value:
+        return tuple(POST_FIELDS)
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()))
+    unknown = set(fields) - set(POST_FIELDS)
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}; '
+                         f'доступны: {", ".join(POST_FIELDS)}')
+    return fields or tuple(POST_FIELDS)
+
+
+def select_fields(queryset, fields, prefix='', extra=()):
+    """Ограничивает queryset колонками полей `fields`.
+
+    `prefix` — путь к посту от модели queryset (`post__` для ленты
+    подписок), `extra` — колонки самой модели, нужные курсору.
+    """
+    related = [prefix + name for name in RELATED_FIELDS if name in fields]
+    if prefix:
+        related.append(prefix.rstrip('_'))
+    columns = chain(CURSOR_COLUMNS,
+                    *(POST_FIELDS[name] for name in fields))
+    return queryset.select_related(*related).only(
+        *extra, *(prefix + column for column in columns))
+
+
+def serialize_user(user):
+    return {'username': user.username, 'full_name': user.get_full_name()}
+
+
+def serialize_post(post, fields, request):
+    data = {}
+    for name in fields:
+        if name == 'author':
+            data[name] = serialize_user(post.author)
+        elif name == 'group':
+            data[name] = post.group and {'slug': post.group.slug,
+                                         'title': post.group.title}
+        elif name == 'image':
+            data[name] = (request.build_absolute_uri(post.image.url)
+                          if post.image else None)
+        elif name == 'comments_count':
+            data[name] = post.comments_count
+        else:
+            data[name] = getattr(post, name)
+    return data
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.id,
+        'author': serialize_user(comment.author),
+        'text': comment.text,
+        'created': comment.created,
+    }
@@ -0,0 +1,136 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counters, search  # isort:skip
+from posts.models import Comment, Follow, Group, Post  # isort:skip
+
+User = get_user_model()
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='bot')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='batch',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def post_json(self, name, items, client=None):
+        response = (client or self.author_client).post(
+            reverse(f'api:{name}'), json.dumps({'items': items}),
+            content_type='application/json')
+        return response, json.loads(response.content)
+
+    def test_posts_are_created_with_side_effects(self):
+        response, data = self.post_json('batch_posts', [
+            {'text': 'первый пакетный', 'group': self.group.id},
+            {'text': ''},
+            {'text': 'второй пакетный'},
+            'не объект',
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data['created'], 2)
+        statuses = [result['status'] for result in data['results']]
+        self.assertEqual(statuses,
+                         ['created', 'invalid', 'created', 'invalid'])
+        self.assertIn('text', data['results'][1]['errors'])
+        first = Post.objects.get(pk=data['results'][0]['id'])
+        self.assertEqual(first.text, 'первый пакетный')
+        self.assertEqual(first.author, self.author)
+        self.assertEqual(first.group, self.group)
+        self.assertEqual(
+            Post.objects.get(pk=data['results'][2]['id']).text,
+            'второй пакетный')
+        # То, что при обычном сохранении делают сигналы
+        self.assertEqual(counters.get(counters.AUTHOR_POSTS, self.author.id),
+                         counters.live_count(counters.AUTHOR_POSTS,
+                                             self.author.id))
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.id), 1)
+        self.assertEqual(self.reader.timeline.count(), 2)
+        if search.is_available():
+            found, _ = search.search('пакетный', 10)
+            self.assertEqual(len(found), 2)
+
+    def test_queries_do_not_grow_with_batch(self):
+        queries = []
+        for size in (1, 10, 100):
+            items = [{'text': f'пост {number}'} for number in range(size)]
+            with CaptureQueriesContext(connection) as captured:
+                response, data = self.post_json('batch_posts', items)
+            self.assertEqual(data['created'], size)
+            queries.append(len(captured))
+        # Первый пакет еще и создает строки счетчиков
+        self.assertEqual(queries[1], queries[2])
+
+    def test_comments(self):
+        post = Post.objects.create(text='пост', author=self.author)
+        counters.get(counters.POST_COMMENTS, post.id)
+        response, data = self.post_json('batch_comments', [
+            {'post': post.id, 'text': 'один'},
+            {'post': post.id, 'text': 'два'},
+            {'post': post.id + 100, 'text': 'мимо'},
+            {'post': post.id},
+        ], client=self.author_client)
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(data['results'][2]['errors'],
+                         {'post': [{'message': 'Пост не найден',
+                                    'code': 'invalid'}]})
+        self.assertIn('text', data['results'][3]['errors'])
+        self.assertEqual(
+            Comment.objects.get(pk=data['results'][1]['id']).text, 'два')
+        self.assertEqual(counters.get(counters.POST_COMMENTS, post.id), 2)
+
+    def test_comment_post_ids(self):
+        post = Post.objects.create(text='пост', author=self.author)
+        response, data = self.post_json('batch_comments', [
+            {'post': str(post.id), 'text': 'строкой'},
+            # true == 1 в Python, но это не id
+            {'post': True, 'text': 'логическое'},
+            {'post': '1.5', 'text': 'дробное'},
+            {'text': 'без поста'},
+        ])
+        self.assertEqual(
+            [result['status'] for result in data['results']],
+            ['created', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(Comment.objects.get().post, post)
+        for result in data['results'][1:]:
+            self.assertEqual(result['errors'],
+                             {'post': [{'message': 'Ожидается id поста',
+                                        'code': 'invalid'}]})
+
+    def test_invalid_requests(self):
+        response, data = self.post_json('batch_posts', [{'text': 'x'}],
+                                        client=Client())
+        self.assertEqual(response.status_code, 401)
+        response, data = self.post_json('batch_posts', [])
+        self.assertEqual(response.status_code, 400)
+        response, data = self.post_json('batch_posts', [{'text': ''}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data['created'], 0)
+        response = self.author_client.post(
+            reverse('api:batch_posts'), 'не json',
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Некорректный JSON',
+                      json.loads(response.content)['detail'])
+        csrf_client = Client(enforce_csrf_checks=True)
+        csrf_client.force_login(self.author)
+        response = csrf_client.post(
+            reverse('api:batch_posts'), json.dumps({'items': [{'text': 'x'}]}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        response = self.author_client.get(reverse('api:batch_posts'))
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(Post.objects.exists())
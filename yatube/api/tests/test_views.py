@@ -0,0 +1,161 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import counters  # isort:skip
+from posts.models import (  # isort:skip
+    Comment, Counter, Follow, Group, Post)
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='api',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(text=f'пост {number}', author=cls.author,
+                                group=cls.group if number % 2 else None)
+            for number in range(5)
+        ]
+        Comment.objects.create(text='комментарий', post=cls.posts[-1],
+                               author=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, url, client=None, **params):
+        response = (client or self.client).get(url, params)
+        return response, json.loads(response.content)
+
+    def test_feed_is_paginated_by_cursor(self):
+        response, data = self.get_json(reverse('api:posts'),
+                                       limit=2, fields='id')
+        ids = [post['id'] for post in data['results']]
+        while data['next']:
+            # Ссылка next сохраняет limit и fields
+            response, data = self.get_json(data['next'])
+            self.assertEqual(len(data['results'][0]), 1)
+            ids.extend(post['id'] for post in data['results'])
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+
+    def test_fields_select_columns(self):
+        # Страница и агрегат валидаторов (posts/conditional.py)
+        with self.assertNumQueries(2):
+            response, data = self.get_json(reverse('api:posts'),
+                                           fields='id,text,author', limit=1)
+        self.assertEqual(data['results'], [{
+            'id': self.posts[-1].id,
+            'text': 'пост 4',
+            'author': {'username': 'author', 'full_name': 'Лев Толстой'},
+        }])
+        # Счетчики постов без комментариев заводятся при первом чтении
+        self.get_json(reverse('api:posts'), fields='comments_count')
+        cache.clear()
+        # Счетчики комментариев — еще один запрос на всю страницу
+        with self.assertNumQueries(3):
+            response, data = self.get_json(reverse('api:posts'))
+        self.assertEqual(data['results'][0]['comments_count'], 1)
+        self.assertEqual(data['results'][1]['comments_count'], 0)
+        self.assertEqual(set(data['results'][0]),
+                         {'id', 'text', 'pub_date', 'author', 'group',
+                          'image', 'comments_count'})
+
+    def test_missing_comment_counters_are_recounted(self):
+        # Посты, созданные до появления счетчиков
+        Counter.objects.all().delete()
+        response, data = self.get_json(reverse('api:posts'),
+                                       fields='id,comments_count')
+        self.assertEqual(
+            [post['comments_count'] for post in data['results']],
+            [1, 0, 0, 0, 0])
+        self.assertEqual(Counter.objects.filter(
+            name=counters.POST_COMMENTS).count(), 5)
+
+    def test_group_profile_and_detail(self):
+        response, data = self.get_json(
+            reverse('api:group_posts', args=(self.group.slug,)),
+            fields='group')
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['results'][0]['group'],
+                         {'slug': 'api', 'title': 'Группа'})
+        response, data = self.get_json(
+            reverse('api:profile_posts', args=('author',)), fields='id')
+        self.assertEqual(len(data['results']), 5)
+        response, data = self.get_json(
+            reverse('api:post_detail', args=(self.posts[-1].id,)),
+            fields='id')
+        self.assertEqual(data['comments'][0]['text'], 'комментарий')
+        self.assertEqual(data['comments'][0]['author']['username'], 'reader')
+        self.assertIsNone(data['comments_next'])
+
+    def test_post_comments_are_paginated(self):
+        post = self.posts[0]
+        for number in range(3):
+            Comment.objects.create(post=post, author=self.reader,
+                                   text=f'комментарий {number}')
+        response, data = self.get_json(
+            reverse('api:post_detail', args=(post.id,)), limit=2,
+            fields='id,comments_count')
+        self.assertEqual(data['comments_count'], 3)
+        texts = [comment['text'] for comment in data['comments']]
+        while data['comments_next']:
+            response, data = self.get_json(data['comments_next'])
+            self.assertEqual(data['id'], post.id)
+            texts.extend(comment['text'] for comment in data['comments'])
+        self.assertEqual(texts, [f'комментарий {number}'
+                                 for number in range(3)])
+
+    def test_follow_feed(self):
+        response, data = self.get_json(reverse('api:follow_posts'))
+        self.assertEqual(response.status_code, 401)
+        response, data = self.get_json(reverse('api:follow_posts'),
+                                       self.reader_client, fields='id')
+        self.assertEqual([post['id'] for post in data['results']],
+                         [post.id for post in reversed(self.posts)])
+
+    def test_errors_are_json(self):
+        cases = (
+            (reverse('api:posts'), {'fields': 'password'}, 400),
+            (reverse('api:posts'), {'limit': '1000'}, 400),
+            (reverse('api:posts'), {'limit': 'десять'}, 400),
+            (reverse('api:posts'), {'after': 'мусор'}, 400),
+            (reverse('api:post_detail', args=(0,)), {}, 404),
+            (reverse('api:profile_posts', args=('nobody',)), {}, 404),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response, data = self.get_json(url, **params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', data)
+        response, data = self.get_json(reverse('api:posts'), limit='десять')
+        self.assertEqual(data['detail'], 'limit — целое число от 1 до 100')
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_etag(self):
+        url = reverse('api:posts')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Post.objects.create(text='новый пост', author=self.author)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_follow_feed_etag_changes_on_follow(self):
+        url = reverse('api:follow_posts')
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['results'], [])
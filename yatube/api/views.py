@@ -0,0 +1,270 @@
+"""JSON API лент для мобильных клиентов и пакетная запись.
+
+Ленты листаются только вперед, по курсору `after` из ссылки `next`:
+без OFFSET и COUNT(*). Так же листаются комментарии поста (ссылка
+`comments_next`). Ответы помечаются ETag так же, как HTML-страницы
+(posts/conditional.py), и повторный запрос с If-None-Match получает 304.
+Пакетная запись (api/batch.py) защищена CSRF, как и формы сайта.
+"""
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.core.paginator import InvalidPage
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_POST, require_safe
+
+from posts import counters, timeline
+from posts.conditional import conditional_page, request_cached
+from posts.models import Follow, Group, Post, TimelineEntry
+from posts.paginators import AFTER, CursorPaginator
+
+from . import batch, serializers
+from .exceptions import BadRequest
+
+from yatube.settings import (  # isort:skip
+    API_BATCH_MAX_ITEMS, API_MAX_PAGE_SIZE, API_PAGE_SIZE)
+
+User = get_user_model()
+
+# Комментарии к посту читаются по индексу (post, created)
+COMMENT_ORDERING = ('created', 'id')
+
+
+def json_response(data, status=200):
+    # Кириллица без \uXXXX: ответ вдвое короче
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def error(status, message):
+    return json_response({'detail': message}, status)
+
+
+def json_errors(view):
+    """Ошибки — JSON, а не HTML-страницы."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return error(404, 'Не найдено')
+        except (BadRequest, InvalidPage) as exc:
+            return error(400, str(exc))
+    return wrapper
+
+
+def api_view(view):
+    """Чтение: только GET/HEAD."""
+    return require_safe(json_errors(view))
+
+
+def batch_view(view):
+    """Запись: только POST с JSON `{"items": [...]}`."""
+    return require_POST(json_errors(view))
+
+
+def login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error(401, 'Нужна авторизация')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def page_size(request):
+    value = request.GET.get('limit')
+    if value is None:
+        return API_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        size = 0
+    if not 1 <= size <= API_MAX_PAGE_SIZE:
+        raise BadRequest(
+            f'limit — целое число от 1 до {API_MAX_PAGE_SIZE}')
+    return size
+
+
+def feed_page(request, queryset, ordering=('-pub_date', '-id'),
+              get_post=None):
+    """Объекты страницы ленты или комментариев и ссылка на следующую.
+
+    `size + 1` строк одним запросом: лишняя строка говорит, что есть
+    следующая страница."""
+    paginator = CursorPaginator(queryset, page_size(request),
+                                ordering=ordering)
+    objects = paginator.object_list
+    cursor = request.GET.get(AFTER)
+    if cursor:
+        objects = objects.filter(
+            paginator.keyset_filter(paginator.decode_cursor(cursor)))
+    objects = list(objects[:paginator.per_page + 1])
+    next_url = None
+    if len(objects) > paginator.per_page:
+        objects = objects[:paginator.per_page]
+        query = request.GET.copy()
+        query[AFTER] = paginator.encode_cursor(objects[-1])
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{query.urlencode()}')
+    posts = [get_post(obj) for obj in objects] if get_post else objects
+    return posts, next_url
+
+
+def page_posts(page):
+    """Посты страницы page(request, ...) для conditional_page."""
+    def posts(request, *args, **kwargs):
+        return page(request, *args, **kwargs)[0]
+    return posts
+
+
+def feed_response(request, page, fields):
+    posts, next_url = page
+    if 'comments_count' in fields:
+        values = counters.get_values(counters.POST_COMMENTS,
+                                     [post.id for post in posts])
+        for post in posts:
+            post.comments_count = values[post.id]
+    return json_response({
+        'results': [serializers.serialize_post(post, fields, request)
+                    for post in posts],
+        'next': next_url,
+    })
+
+
+def post_fields(request):
+    return serializers.parse_fields(request.GET.get('fields'))
+
+
+@request_cached
+def posts_page(request):
+    return feed_page(request, serializers.select_fields(
+        Post.objects.all(), post_fields(request)))
+
+
+@api_view
+@conditional_page(page_posts(posts_page))
+def posts(request):
+    return feed_response(request, posts_page(request), post_fields(request))
+
+
+@request_cached
+def group_page(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_page(request, serializers.select_fields(
+        group.posts.all(), post_fields(request)))
+
+
+@api_view
+@conditional_page(page_posts(group_page))
+def group_posts(request, slug):
+    return feed_response(request, group_page(request, slug),
+                         post_fields(request))
+
+
+@request_cached
+def profile_page(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_page(request, serializers.select_fields(
+        author.posts.all(), post_fields(request)))
+
+
+@api_view
+@conditional_page(page_posts(profile_page))
+def profile_posts(request, username):
+    return feed_response(request, profile_page(request, username),
+                         post_fields(request))
+
+
+@request_cached
+def post_page(request, post_id):
+    post = get_object_or_404(serializers.select_fields(
+        Post.objects.all(), post_fields(request)), id=post_id)
+    return [post], None
+
+
+@api_view
+@conditional_page(page_posts(post_page))
+def post_detail(request, post_id):
+    """Пост и страница его комментариев, от старых к новым; следующая
+    страница комментариев — по ссылке `comments_next`."""
+    fields = post_fields(request)
+    post = post_page(request, post_id)[0][0]
+    comments, next_url = feed_page(
+        request,
+        post.comments.select_related('author').only(
+            'id', 'text', 'created', 'post_id', 'author__username',
+            'author__first_name', 'author__last_name'),
+        ordering=COMMENT_ORDERING)
+    post.comments_count = counters.get(counters.POST_COMMENTS, post.id)
+    data = serializers.serialize_post(post, fields, request)
+    data['comments'] = [serializers.serialize_comment(comment)
+                        for comment in comments]
+    data['comments_next'] = next_url
+    return json_response(data)
+
+
+def follow_etag_parts(request):
+    # Подписки меняют ленту, но не посты в ней
+    if not request.user.is_authenticated:
+        return ()
+    state = Follow.objects.filter(user=request.user).aggregate(
+        count=Count('id'), last=Max('id'))
+    return state['count'], state['last']
+
+
+@request_cached
+def follow_page(request):
+    fields = post_fields(request)
+    entries = serializers.select_fields(
+        TimelineEntry.objects.filter(user=request.user), fields,
+        prefix='post__', extra=('pub_date', 'post'))
+    entries = timeline.feed(
+        request.user, entries,
+        serializers.select_fields(Post.objects.all(), fields))
+    return feed_page(request, entries, ordering=timeline.ORDERING,
+                     get_post=lambda entry: entry.post)
+
+
+@api_view
+@login_required
+@conditional_page(page_posts(follow_page), follow_etag_parts)
+def follow_posts(request):
+    return feed_response(request, follow_page(request), post_fields(request))
+
+
+def batch_items(request):
+    try:
+        data = json.loads(request.body.decode())
+    except ValueError as exc:
+        # В том числе UnicodeDecodeError
+        raise BadRequest(f'Некорректный JSON: {exc}')
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BadRequest('Ожидается {"items": [...]}')
+    if len(items) > API_BATCH_MAX_ITEMS:
+        raise BadRequest(f'Не больше {API_BATCH_MAX_ITEMS} элементов')
+    return items
+
+
+def batch_response(results):
+    created = sum(result['status'] == 'created' for result in results)
+    return json_response({'created': created, 'results': results},
+                         201 if created else 400)
+
+
+@batch_view
+@login_required
+def batch_posts(request):
+    return batch_response(
+        batch.create_posts(request.user, batch_items(request)))
+
+
+@batch_view
+@login_required
+def batch_comments(request):
+    return batch_response(
+        batch.create_comments(request.user, batch_items(request)))
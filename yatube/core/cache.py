@@ -0,0 +1,211 @@
+"""Бэкенд кэша Django в файле SQLite.
+
+LocMemCache у каждого процесса свой: фрагменты копируются по числу
+воркеров, а сброс кэша в одном процессе не виден другим. Этот бэкенд
+хранит кэш в одном файле SQLite на хосте и не требует отдельного
+сервиса. Запись идет в режиме WAL, поэтому чтения не ждут писателя,
+а add() и incr() атомарны между процессами (BEGIN IMMEDIATE).
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+    }}
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+# Каждая какая по счету запись в процессе запускает очистку
+CULL_EVERY = 100
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self.busy_timeout = float(
+            params.get('OPTIONS', {}).get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def connection(self):
+        # Соединение свое у каждого потока и у каждого процесса после fork
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            for sql in SCHEMA:
+                connection.execute(sql)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return time.time() + timeout
+
+    def _load(self, row):
+        """Значение строки или None, если ее нет или она истекла."""
+        if row is None:
+            return None
+        value, expires = row
+        if expires is not None and expires <= time.time():
+            return None
+        return pickle.loads(value)
+
+    def _transaction(self):
+        return _Immediate(self.connection)
+
+    def get(self, key, default=None, version=None):
+        row = self.connection.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (self._key(key, version),)).fetchone()
+        value = self._load(row)
+        return default if value is None else value
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        if not made:
+            return {}
+        rows = self.connection.execute(
+            'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+            % ', '.join('?' * len(made)), list(made)).fetchall()
+        result = {}
+        for key, value, expires in rows:
+            value = self._load((value, expires))
+            if value is not None:
+                result[made[key]] = value
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        rows = [
+            (self._key(key, version),
+             pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+            for key, value in data.items()
+        ]
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', rows)
+        self._maybe_cull(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()))
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                 self._expires(timeout))).rowcount
+        self._maybe_cull(added)
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            value = self._load(connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,)).fetchone())
+            if value is None:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key))
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            return bool(connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self._expires(timeout), key, time.time())).rowcount)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._transaction() as connection:
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение с файлом кэша живет весь процесс, как и LocMemCache
+        pass
+
+    def _maybe_cull(self, written):
+        self._writes += written
+        if self._writes < CULL_EVERY:
+            return
+        self._writes = 0
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+            else:
+                # Как у Django: убираем 1/CULL_FREQUENCY, раньше всего
+                # истекающие записи
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (count // self._cull_frequency,))
+
+
+class _Immediate:
+    """Транзакция, сразу берущая блокировку записи в файле."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('COMMIT' if exc_type is None else 'ROLLBACK')
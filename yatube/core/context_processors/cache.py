@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def cache_timeouts(request):
+    """Добавляет таймаут кэша карточек постов."""
+    return {'card_cache_timeout': settings.CARD_CACHE_TIMEOUT}
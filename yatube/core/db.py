@@ -0,0 +1,19 @@
+"""Настройка соединений SQLite.
+
+WAL позволяет читателям не ждать писателя (post_create, add_comment),
+synchronous=NORMAL в режиме WAL не теряет целостность, а больший кэш
+страниц и mmap снижают число системных вызовов на чтение.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
@@ -0,0 +1,121 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas
+
+# Настройки SQLite по умолчанию: журнал отката и полная синхронизация
+DEFAULT_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+AUTHORS = 100
+
+
+def prepare(path, rows):
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+        'pub_date REAL, text TEXT);'
+        'CREATE INDEX post_author_pub_date ON post (author_id, pub_date);'
+    )
+    connection.executemany(
+        'INSERT INTO post (author_id, pub_date, text) VALUES (?, ?, ?)',
+        ((random.randrange(AUTHORS), time.time(), 'текст поста' * 10)
+         for _ in range(rows)),
+    )
+    connection.commit()
+    connection.close()
+
+
+def run(path, pragmas, readers, writers, duration, timeout):
+    stats = {'reads': 0, 'writes': 0, 'busy': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def connect():
+        connection = sqlite3.connect(path, timeout=timeout)
+        apply_pragmas(connection.cursor(), pragmas)
+        return connection
+
+    def worker(operation, stat):
+        connection = connect()
+        done = busy = 0
+        while time.monotonic() < deadline:
+            try:
+                operation(connection)
+                done += 1
+            except sqlite3.OperationalError:
+                busy += 1
+        connection.close()
+        with lock:
+            stats[stat] += done
+            stats['busy'] += busy
+
+    def read(connection):
+        connection.execute(
+            'SELECT id, text FROM post WHERE author_id = ? '
+            'ORDER BY pub_date DESC LIMIT 10',
+            (random.randrange(AUTHORS),),
+        ).fetchall()
+
+    def write(connection):
+        with connection:
+            connection.execute(
+                'INSERT INTO post (author_id, pub_date, text) '
+                'VALUES (?, ?, ?)',
+                (random.randrange(AUTHORS), time.time(), 'новый пост'),
+            )
+
+    threads = [
+        threading.Thread(target=worker, args=(read, 'reads'))
+        for _ in range(readers)
+    ] + [
+        threading.Thread(target=worker, args=(write, 'writes'))
+        for _ in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {name: value / duration for name, value in stats.items()}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает конкурентное чтение и запись в SQLite '
+            'с настройками по умолчанию и с SQLITE_PRAGMAS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument('--duration', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=20000)
+        parser.add_argument('--timeout', type=float, default=5)
+
+    def handle(self, *args, **options):
+        modes = (
+            ('по умолчанию', DEFAULT_PRAGMAS),
+            ('SQLITE_PRAGMAS', settings.SQLITE_PRAGMAS),
+        )
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            for number, (label, pragmas) in enumerate(modes):
+                path = os.path.join(directory, f'bench_{number}.sqlite3')
+                prepare(path, options['rows'])
+                result = run(path, pragmas, options['readers'],
+                             options['writers'], options['duration'],
+                             options['timeout'])
+                results.append(result)
+                self.stdout.write(
+                    f'{label:>16}: чтений/с {result["reads"]:10.1f}  '
+                    f'записей/с {result["writes"]:8.1f}  '
+                    f'ошибок блокировки/с {result["busy"]:6.1f}'
+                )
+        default, tuned = results
+        for stat, label in (('reads', 'чтение'), ('writes', 'запись')):
+            if default[stat]:
+                self.stdout.write(
+                    f'{label}: x{tuned[stat] / default[stat]:.2f}')
@@ -0,0 +1,232 @@
+"""Время и число запросов к базе по view.
+
+MetricsMiddleware для доли запросов METRICS_SAMPLE_RATE замеряет полное
+время ответа, время и число SQL-запросов (execute_wrapper) и время
+рендеринга шаблонов (бэкенд TimedDjangoTemplates в TEMPLATES). Замер
+уходит клиенту в заголовке Server-Timing и суммируется по имени view:
+счетчики, суммы и гистограмма времени ответа (METRICS_BUCKETS, мс).
+
+Суммы копятся в памяти процесса и раз в METRICS_FLUSH_INTERVAL секунд
+одной записью попадают в кэш, в ключ процесса. С общим бэкендом кэша
+(CACHE_BACKEND=sqlite) summary() складывает ключи всех процессов.
+Запросы вне выборки проходят без замеров: одна проверка random().
+"""
+import atexit
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise)
+from django.urls import Resolver404, URLResolver, get_resolver, resolve
+
+_state = threading.local()
+UNRESOLVED = 'unresolved'
+# Число процессов, получивших свой ключ сводки
+SLOTS_KEY = 'metrics:processes'
+
+# Суммы процесса по view, еще не записанные в кэш
+_totals = {}
+_totals_lock = threading.Lock()
+_slot = None
+_flushed_at = time.monotonic()
+
+
+class QueryTimer:
+    def __init__(self, timings):
+        self.timings = timings
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timings['db'] += time.perf_counter() - started
+            self.timings['queries'] += 1
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = getattr(_state, 'timings', None)
+        if timings is None or timings['depth']:
+            # Вне замера или вложенный шаблон — уже учтен снаружи
+            return super().render(context, request)
+        timings['depth'] += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings['template'] += time.perf_counter() - started
+            timings['depth'] -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django, время рендеринга которых попадает в замер."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def view_name(request):
+    match = request.resolver_match
+    if match is None:
+        # Ответ из кэша страниц: до разбора адреса дело не дошло
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return UNRESOLVED
+    return match.view_name
+
+
+def process_key(slot):
+    return f'metrics:process:{slot}'
+
+
+def bucket(milliseconds):
+    for bound in settings.METRICS_BUCKETS:
+        if milliseconds <= bound:
+            return str(bound)
+    return 'inf'
+
+
+def record(view, total, timings):
+    values = {
+        'count': 1,
+        'total_us': int(total * 1e6),
+        'db_us': int(timings['db'] * 1e6),
+        'template_us': int(timings['template'] * 1e6),
+        'queries': timings['queries'],
+        f'le_{bucket(total * 1000)}': 1,
+    }
+    with _totals_lock:
+        totals = _totals.setdefault(view, {})
+        for field, value in values.items():
+            totals[field] = totals.get(field, 0) + value
+        if time.monotonic() - _flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+    flush()
+
+
+def take_slot():
+    try:
+        return cache.incr(SLOTS_KEY)
+    except ValueError:
+        cache.add(SLOTS_KEY, 0, None)
+        return cache.incr(SLOTS_KEY)
+
+
+@atexit.register
+def flush():
+    """Добавляет накопленные суммы в ключ процесса: одно чтение и одна
+    запись. Ключ пишет только этот процесс, поэтому гонки нет."""
+    global _slot, _flushed_at
+    with _totals_lock:
+        _flushed_at = time.monotonic()
+        if not _totals:
+            return
+        slots = cache.get(SLOTS_KEY, 0)
+        if _slot is None or slots < _slot:
+            # Первая запись процесса или кэш очищен
+            _slot = take_slot()
+        stored = cache.get(process_key(_slot)) or {}
+        for view, totals in _totals.items():
+            fields = stored.setdefault(view, {})
+            for field, value in totals.items():
+                fields[field] = fields.get(field, 0) + value
+        cache.set(process_key(_slot), stored, None)
+        _totals.clear()
+
+
+def view_names(resolver=None, namespace=''):
+    """Имена всех view из urls.py, как в request.resolver_match."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            inner = namespace
+            if pattern.namespace:
+                inner = f'{namespace}{pattern.namespace}:'
+            yield from view_names(pattern, inner)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}'
+
+
+def summary():
+    """Сводка по view: средние значения и гистограмма времени ответа."""
+    flush()
+    views = sorted(set(view_names())) + [UNRESOLVED]
+    buckets = [str(bound) for bound in settings.METRICS_BUCKETS] + ['inf']
+    keys = [process_key(slot)
+            for slot in range(1, cache.get(SLOTS_KEY, 0) + 1)]
+    values = {}
+    for stored in cache.get_many(keys).values():
+        for view, totals in stored.items():
+            fields = values.setdefault(view, {})
+            for field, value in totals.items():
+                fields[field] = fields.get(field, 0) + value
+    result = {}
+    for view in views:
+        fields = values.get(view, {})
+        count = fields.get('count')
+        if not count:
+            continue
+
+        def average(field):
+            return fields.get(field, 0) / count
+
+        result[view] = {
+            'count': count,
+            'total_ms': round(average('total_us') / 1000, 2),
+            'db_ms': round(average('db_us') / 1000, 2),
+            'template_ms': round(average('template_us') / 1000, 2),
+            'queries': round(average('queries'), 2),
+            'histogram_ms': {
+                le: fields.get(f'le_{le}', 0)
+                for le in buckets
+            },
+        }
+    return result
+
+
+def server_timing(total, timings):
+    return (
+        f'total;dur={total * 1000:.1f}, '
+        f'db;dur={timings["db"] * 1000:.1f};'
+        f'desc="{timings["queries"]} queries", '
+        f'tpl;dur={timings["template"] * 1000:.1f}'
+    )
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        timings = {'db': 0.0, 'queries': 0, 'template': 0.0, 'depth': 0}
+        _state.timings = timings
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(QueryTimer(timings)))
+                response = self.get_response(request)
+        finally:
+            _state.timings = None
+        total = time.perf_counter() - started
+        response['Server-Timing'] = server_timing(total, timings)
+        record(view_name(request), total, timings)
+        return response
@@ -0,0 +1,143 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Анонимный запрос (без cookie сессии) к странице из PAGE_CACHE_VIEWS
+отдается из кэша до SessionMiddleware, аутентификации, CSRF и
+шаблонов. Ключ — путь и строка запроса; у каждого пути своя версия,
+и purge() сбрасывает все варианты пути (страницы, курсоры) разом,
+не трогая остальные. Что сбрасывать при изменениях, решают сигналы
+приложений (см. posts/signals.py).
+
+Попадания и промахи копятся в памяти процесса и записываются в кэш
+не чаще раза в PAGE_CACHE_STATS_INTERVAL секунд: запись в общий кэш
+на каждый анонимный запрос стоила бы столько же, сколько само
+попадание.
+"""
+import atexit
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import NoReverseMatch, Resolver404, resolve, reverse
+from django.utils.cache import get_conditional_response
+
+HITS_KEY = 'page_cache:hits'
+MISSES_KEY = 'page_cache:misses'
+
+
+def version_key(path):
+    return 'page_cache:version:' + hashlib.md5(path.encode()).hexdigest()
+
+
+def page_key(request):
+    version = cache.get_or_set(version_key(request.path), 1, None)
+    full_path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page_cache:page:{version}:{full_path}'
+
+
+def page_path(view_name, *args):
+    """Адрес страницы или None, если такой страницы быть не может."""
+    try:
+        return reverse(view_name, args=args)
+    except NoReverseMatch:
+        return None
+
+
+def purge(*paths):
+    for path in paths:
+        if path is None:
+            continue
+        try:
+            cache.incr(version_key(path))
+        except ValueError:
+            # Версии нет — нет и закэшированных страниц этого пути
+            pass
+
+
+# Счетчики процесса, еще не записанные в кэш
+_counts = {HITS_KEY: 0, MISSES_KEY: 0}
+_counts_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def _take_counts():
+    global _flushed_at
+    pending = dict(_counts)
+    for key in _counts:
+        _counts[key] = 0
+    _flushed_at = time.monotonic()
+    return pending
+
+
+def _write_counts(pending):
+    for key, value in pending.items():
+        if not value:
+            continue
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            if not cache.add(key, value, None):
+                cache.incr(key, value)
+
+
+def count(key):
+    with _counts_lock:
+        _counts[key] += 1
+        if (time.monotonic() - _flushed_at
+                < settings.PAGE_CACHE_STATS_INTERVAL):
+            return
+        pending = _take_counts()
+    _write_counts(pending)
+
+
+@atexit.register
+def flush():
+    """Записывает в кэш счетчики, накопленные процессом."""
+    with _counts_lock:
+        pending = _take_counts()
+    _write_counts(pending)
+
+
+def stats():
+    flush()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    return {'hits': hits, 'misses': misses}
+
+
+def is_cacheable(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        # Вошедший пользователь или начатая сессия
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    return match.view_name in settings.PAGE_CACHE_VIEWS
+
+
+class PageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_cacheable(request):
+            return self.get_response(request)
+        key = page_key(request)
+        response = cache.get(key)
+        if response is not None:
+            count(HITS_KEY)
+            response['X-Page-Cache'] = 'HIT'
+            return get_conditional_response(
+                request, etag=response.get('ETag'), response=response)
+        count(MISSES_KEY)
+        response = self.get_response(request)
+        # Ответ с cookie (например, csrftoken) принадлежит одному посетителю
+        if (response.status_code == 200 and not response.streaming
+                and not response.cookies):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertEqual(self.cache.get_many(['key', 'missing']),
+                         {'key': {'value': 1}})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_value_is_missing_and_can_be_added(self):
+        self.cache.set('key', 'старое', 0.01)
+        time.sleep(0.02)
+        self.assertEqual(self.cache.get('key', 'нет'), 'нет')
+        self.assertTrue(self.cache.add('key', 'новое'))
+        self.assertFalse(self.cache.add('key', 'еще новее'))
+        self.assertEqual(self.cache.get('key'), 'новое')
+
+    def test_incr_missing_key(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_processes_share_cache(self):
+        self.cache.set('counter', 0, None)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # incr атомарен между процессами: ни одно увеличение не потеряно
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_clear(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.cache.clear()
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
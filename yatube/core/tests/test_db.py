@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+
+class SQLitePragmaTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_connection(self):
+        # synchronous: 1 — NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'),
+                         settings.SQLITE_PRAGMAS['cache_size'])
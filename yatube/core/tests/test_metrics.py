@@ -0,0 +1,59 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+
+User = get_user_model()
+
+
+@override_settings(METRICS_SAMPLE_RATE=1)
+class MetricsTests(TestCase):
+    def setUp(self):
+        # Замеры прошлых тестов копятся в процессе
+        metrics.flush()
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(
+            User.objects.create_user(username='staff', is_staff=True))
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertRegex(response['Server-Timing'],
+                         r'^total;dur=[\d.]+, db;dur=[\d.]+;'
+                         r'desc="\d+ queries", tpl;dur=[\d.]+$')
+
+    def test_metrics_are_aggregated_by_view(self):
+        for _ in range(2):
+            self.client.get(reverse('posts:group_list', args=('missing',)))
+        response = self.staff_client.get(reverse('metrics'))
+        metrics = json.loads(response.content)
+        self.assertEqual(metrics['posts:group_list']['count'], 2)
+        self.assertGreater(metrics['posts:group_list']['queries'], 0)
+        self.assertEqual(
+            sum(metrics['posts:group_list']['histogram_ms'].values()), 2)
+
+    def test_sums_are_written_once_per_interval(self):
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        # Запросы в кэш не пишут, пока не прошел интервал
+        self.assertIsNone(cache.get(metrics.SLOTS_KEY))
+        index = metrics.summary()['posts:index']
+        self.assertEqual(index['count'], 3)
+        # Время шаблонов замеряет бэкенд TimedDjangoTemplates
+        self.assertGreater(index['template_ms'], 0)
+        self.assertEqual(cache.get(metrics.SLOTS_KEY), 1)
+
+    def test_metrics_endpoint_is_for_staff(self):
+        client = Client()
+        client.force_login(User.objects.create_user(username='reader'))
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_no_timing_when_sampling_is_off(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import page_cache
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание')
+        cls.post = Post.objects.create(text='пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        # Счетчики прошлых тестов копятся в процессе
+        page_cache.flush()
+        cache.clear()
+
+    def cache_status(self, url, client=None):
+        return (client or self.client).get(url)['X-Page-Cache']
+
+    def test_anonymous_pages_are_cached(self):
+        url = reverse('posts:group_list', args=('group',))
+        self.assertEqual(self.cache_status(url), 'MISS')
+        self.assertEqual(self.cache_status(url), 'HIT')
+        self.assertEqual(self.cache_status(url + '?page=2'), 'MISS')
+        # В кэш счетчики попадают раз в интервал, stats() дописывает их
+        self.assertIsNone(cache.get(page_cache.HITS_KEY))
+        self.assertEqual(page_cache.stats(), {'hits': 1, 'misses': 2})
+
+    def test_logged_in_users_bypass_cache(self):
+        client = Client()
+        client.force_login(PageCacheTests.reader)
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_new_post_purges_only_affected_pages(self):
+        urls = {
+            reverse('posts:index'): 'MISS',
+            reverse('posts:group_list', args=('group',)): 'MISS',
+            reverse('posts:profile', args=('author',)): 'MISS',
+            reverse('posts:group_list', args=('other',)): 'HIT',
+            reverse('posts:profile', args=('reader',)): 'HIT',
+        }
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(text='новый пост', author=PageCacheTests.author,
+                            group=PageCacheTests.group)
+        for url, status in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.cache_status(url), status)
+
+    def test_comment_and_follow_purge_their_pages(self):
+        detail = reverse('posts:post_detail', args=(PageCacheTests.post.pk,))
+        profile = reverse('posts:profile', args=('author',))
+        self.client.get(detail)
+        self.client.get(profile)
+        Comment.objects.create(post=PageCacheTests.post, text='комментарий',
+                               author=PageCacheTests.reader)
+        Follow.objects.create(user=PageCacheTests.reader,
+                              author=PageCacheTests.author)
+        self.assertEqual(self.cache_status(detail), 'MISS')
+        self.assertEqual(self.cache_status(profile), 'MISS')
+
+    def test_group_delete_purges_author_and_post_pages(self):
+        group = Group.objects.create(title='Удаляемая', slug='doomed',
+                                     description='Описание')
+        post = Post.objects.create(text='пост группы',
+                                   author=PageCacheTests.reader, group=group)
+        urls = (
+            reverse('posts:profile', args=('reader',)),
+            reverse('posts:post_detail', args=(post.pk,)),
+        )
+        untouched = reverse('posts:profile', args=('author',))
+        for url in (*urls, untouched):
+            self.client.get(url)
+        group.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.cache_status(url), 'MISS')
+        self.assertEqual(self.cache_status(untouched), 'HIT')
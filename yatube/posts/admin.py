@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Comment, Follow, Group, Post
 
 
@@ -16,6 +17,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту через FTS5 вместо LIKE '%...%'
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        return search.matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
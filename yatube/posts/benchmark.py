@@ -0,0 +1,188 @@
+"""Сценарии бенчмарка для всех адресов posts/urls.py.
+
+Каждый сценарий — один запрос (метод, адрес, данные) от имени
+пользователя или анонима. Замеряются время ответа, число SQL-запросов
+и пиковая память, выделенная на запрос; перед каждым запросом кэш
+очищается, чтобы мерить рендеринг, а не попадания в кэш.
+"""
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import counters
+from .models import Comment, Counter, Follow, Group, Post
+
+User = get_user_model()
+
+# Тексты записей, которые создают сценарии; по ним записи и удаляются
+POST_TEXT = 'пост из бенчмарка'
+COMMENT_TEXT = 'комментарий из бенчмарка'
+
+
+class Scenario:
+    def __init__(self, name, url, user=None, method='get', data=None,
+                 before=None, after=None):
+        self.name = name
+        self.url = url
+        self.user = user
+        self.method = method
+        self.data = data or {}
+        # Готовит базу к запросу и возвращает ее в исходное состояние
+        # после него (не замеряются)
+        self.before = before
+        self.after = after
+
+
+def top_object_id(name):
+    return Counter.objects.filter(name=name).order_by(
+        '-value', 'object_id').values_list('object_id', flat=True).first()
+
+
+def build_scenarios():
+    """Сценарии на засеянной базе; объекты выбираются детерминированно:
+    самый активный автор, самый подписанный читатель, самая большая
+    группа."""
+    author = User.objects.get(pk=top_object_id(counters.AUTHOR_POSTS))
+    reader = User.objects.get(pk=top_object_id(counters.FOLLOWING))
+    group = Group.objects.get(pk=top_object_id(counters.GROUP_POSTS))
+    post = Post.objects.filter(author=author).order_by('-pub_date').first()
+    target = User.objects.exclude(pk=reader.pk).order_by('pk').first()
+    word = post.text.split()[0]
+    following = Follow.objects.filter(user=reader, author=target).exists()
+
+    def unfollow():
+        Follow.objects.filter(user=reader, author=target).delete()
+
+    def follow():
+        Follow.objects.get_or_create(user=reader, author=target)
+
+    # Подписка возвращается в то состояние, что было до бенчмарка
+    restore = follow if following else unfollow
+
+    # Удаление через ORM: сигналы вернут счетчики и ленты подписок
+    def delete_post():
+        Post.objects.filter(author=author, text=POST_TEXT).delete()
+
+    def delete_comment():
+        Comment.objects.filter(post=post, author=reader,
+                               text=COMMENT_TEXT).delete()
+
+    return [
+        Scenario('index', reverse('posts:index')),
+        Scenario('index_page_5', reverse('posts:index') + '?page=5'),
+        Scenario('group_list',
+                 reverse('posts:group_list', args=(group.slug,))),
+        Scenario('profile', reverse('posts:profile', args=(author.username,))),
+        Scenario('search', reverse('posts:search') + f'?q={word}'),
+        Scenario('post_detail',
+                 reverse('posts:post_detail', args=(post.pk,))),
+        Scenario('post_create_form', reverse('posts:post_create'), author),
+        Scenario('post_create', reverse('posts:post_create'), author,
+                 'post', {'text': POST_TEXT}, after=delete_post),
+        Scenario('post_edit_form',
+                 reverse('posts:post_edit', args=(post.pk,)), author),
+        Scenario('post_edit', reverse('posts:post_edit', args=(post.pk,)),
+                 author, 'post',
+                 {'text': post.text, 'group': post.group_id or ''}),
+        Scenario('add_comment',
+                 reverse('posts:add_comment', args=(post.pk,)), reader,
+                 'post', {'text': COMMENT_TEXT}, after=delete_comment),
+        Scenario('follow_index', reverse('posts:follow_index'), reader),
+        Scenario('profile_follow',
+                 reverse('posts:profile_follow', args=(target.username,)),
+                 reader, before=unfollow, after=restore),
+        Scenario('profile_unfollow',
+                 reverse('posts:profile_unfollow', args=(target.username,)),
+                 reader, before=follow, after=restore),
+    ]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+
+def send(scenario, request):
+    """Один запрос сценария с его подготовкой и откатом; возвращает
+    время в секундах и число SQL-запросов."""
+    if scenario.before is not None:
+        scenario.before()
+    cache.clear()
+    with CaptureQueriesContext(connection) as captured:
+        started = time.perf_counter()
+        response = request(scenario.url, scenario.data)
+        elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f'{scenario.name}: {scenario.url} -> {response.status_code}')
+    if scenario.after is not None:
+        scenario.after()
+    return elapsed, len(captured)
+
+
+def peak_memory_mb(scenario, request):
+    """Пик памяти, выделенной Python за один запрос сценария.
+
+    RSS процесса не годится: его пик за все время жизни — это
+    заполнение базы перед сценариями. tracemalloc замедляет код,
+    поэтому память меряется отдельным запросом, не вместе со временем.
+    """
+    tracemalloc.start()
+    try:
+        send(scenario, request)
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_scenario(scenario, iterations, warmup=1):
+    client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    request = getattr(client, scenario.method)
+    timings = []
+    queries = []
+    for number in range(warmup + iterations):
+        elapsed, count = send(scenario, request)
+        if number >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(count)
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': percentile(queries, 0.5),
+        'peak_mb': round(peak_memory_mb(scenario, request), 2),
+    }
+
+
+def run(scenarios, iterations, warmup=1, log=None):
+    log = log or (lambda name, result: None)
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = run_scenario(scenario, iterations, warmup)
+        log(scenario.name, results[scenario.name])
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Регрессии относительно baseline: p95 выросло больше чем на
+    `tolerance` (доля) или стало больше запросов к базе."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {base["p95_ms"]} -> {result["p95_ms"]} мс')
+        if result['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {base["queries"]} -> {result["queries"]}')
+    return regressions
@@ -0,0 +1,58 @@
+"""То, что сигналы делают для одной записи, — для строк bulk_create.
+
+bulk_create сигналов не отправляет, поэтому пути массовой вставки
+(API batch, перенос контента, генератор данных) сами обновляют
+счетчики, ленты подписок и кэш. posts_created() делает все это для
+новых постов; генератор данных пересчитывает счетчики и ленты целиком
+и берет отсюда только сброс кэша (purge_pages).
+"""
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from core import page_cache
+
+from . import counters, timeline
+from .cache import bump_generation
+from .models import Group
+
+User = get_user_model()
+
+
+def _values(queryset, field, ids):
+    """Значения field для ids; `__in` дробится под лимит параметров."""
+    ids = iter(set(ids) - {None})
+    size = connection.features.max_query_params or 1000
+    chunk = list(islice(ids, size))
+    while chunk:
+        yield from queryset.filter(pk__in=chunk).values_list(field, flat=True)
+        chunk = list(islice(ids, size))
+
+
+def purge_pages(author_ids=(), group_ids=(), post_ids=()):
+    """Сбрасывает кэш лент и страниц для анонимов: поколение
+    фрагментов, главную, профили авторов, страницы групп и постов."""
+    bump_generation()
+    page_cache.purge(
+        page_cache.page_path('posts:index'),
+        *(page_cache.page_path('posts:profile', username)
+          for username in _values(User.objects.all(), 'username',
+                                  author_ids)),
+        *(page_cache.page_path('posts:group_list', slug)
+          for slug in _values(Group.objects.all(), 'slug', group_ids)),
+        *(page_cache.page_path('posts:post_detail', post_id)
+          for post_id in set(post_ids)),
+    )
+
+
+def posts_created(posts):
+    """После bulk_create постов (с id): счетчики, раскладка по лентам
+    подписчиков и, после коммита, сброс кэша страниц, где видны посты."""
+    author_ids = {post.author_id for post in posts}
+    group_ids = {post.group_id for post in posts} - {None}
+    counters.change(counters.ALL_POSTS, 0, len(posts))
+    counters.recount_many(counters.AUTHOR_POSTS, author_ids)
+    counters.recount_many(counters.GROUP_POSTS, group_ids)
+    timeline.fan_out_many(posts)
+    transaction.on_commit(lambda: purge_pages(author_ids, group_ids))
@@ -0,0 +1,115 @@
+"""Версионирование кэша фрагментов лент.
+
+Ключ фрагмента включает номер поколения, который увеличивается при
+любом изменении постов, комментариев и групп. Фрагмент может жить
+долго и перестает использоваться ровно тогда, когда контент изменился.
+
+get_or_refresh() защищает от «лавины» пересчетов: устаревшее или
+относящееся к прошлому поколению значение продолжает отдаваться, пока
+его пересчитывает ровно один обработчик — тот, кто взял блокировку.
+
+Целые страницы для анонимов (core/page_cache.py) сбрасываются точнее —
+по адресам страниц, на которых виден измененный пост.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import page_cache
+
+from .models import Group, Post
+
+GENERATION_KEY = 'posts:generation'
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Начинаем со времени, чтобы не повторить вытесненное поколение
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def get_or_refresh(key, compute, timeout, version=None):
+    """Значение из кэша по принципу stale-while-revalidate.
+
+    Значение свежее `timeout` секунд и пока не сменилась `version`
+    (обычно поколение кэша лент). Устаревшее значение хранится еще
+    STALE_CACHE_TIMEOUT секунд: его отдают всем, кроме одного
+    обработчика, который пересчитывает значение под блокировкой.
+    Пересчитывают все сразу только при холодном кэше.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until, entry_version = entry
+        if fresh_until > time.time() and entry_version == version:
+            return value
+        if not cache.add(f'{key}:lock', 1, settings.STALE_CACHE_LOCK_TIMEOUT):
+            # Пересчитывает другой обработчик
+            return value
+    try:
+        value = compute()
+        cache.set(key, (value, time.time() + timeout, version),
+                  timeout + settings.STALE_CACHE_TIMEOUT)
+    finally:
+        if entry is not None:
+            cache.delete(f'{key}:lock')
+    return value
+
+
+def purge_post_pages(post, *group_ids):
+    """Сбрасывает кэш страниц, на которых виден пост.
+
+    `group_ids` — группы, где пост был раньше (при смене группы).
+    """
+    paths = [
+        page_cache.page_path('posts:index'),
+        page_cache.page_path('posts:profile', post.author.username),
+        page_cache.page_path('posts:post_detail', post.pk),
+    ]
+    group_ids = {post.group_id, *group_ids} - {None}
+    if group_ids:
+        slugs = Group.objects.filter(
+            pk__in=group_ids).values_list('slug', flat=True)
+        paths.extend(page_cache.page_path('posts:group_list', slug)
+                     for slug in slugs)
+    page_cache.purge(*paths)
+
+
+def purge_profile_pages(*users):
+    page_cache.purge(*(page_cache.page_path('posts:profile', user.username)
+                       for user in users))
+
+
+def group_post_paths(group):
+    """Профили авторов и страницы постов группы: на них видна группа.
+
+    При удалении группы посты теряют ее через SET NULL без сигналов
+    Post, поэтому адреса нужно собрать до удаления (pre_delete).
+    """
+    posts = Post.objects.filter(group=group).values_list(
+        'id', 'author__username')
+    paths, usernames = [], set()
+    for post_id, username in posts.iterator():
+        paths.append(page_cache.page_path('posts:post_detail', post_id))
+        usernames.add(username)
+    paths.extend(page_cache.page_path('posts:profile', username)
+                 for username in usernames)
+    return paths
+
+
+def purge_group_pages(group, paths=()):
+    page_cache.purge(
+        page_cache.page_path('posts:index'),
+        page_cache.page_path('posts:group_list', group.slug),
+        *paths,
+    )
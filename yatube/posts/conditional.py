@@ -0,0 +1,103 @@
+"""Условные GET-запросы для страниц с постами.
+
+Валидаторы собираются без рендеринга из того, что видно на странице:
+id постов страницы, их авторы и группы, а также время последней правки
+этих постов и последнего комментария к ним — одним агрегатным запросом.
+Изменение поста на другой странице ETag не меняет. Совпал ETag — ответ
+304 без обращения к шаблонам.
+
+Last-Modified не отправляется: страницу меняют и события без времени —
+подписка, удаление поста или комментария, сдвиг ленты, — и проверка по
+одному If-Modified-Since отдавала бы устаревшую копию.
+
+Посты страницы нужны и валидаторам, и самой view, поэтому функции,
+которые их читают, помечаются request_cached: на запрос — один раз.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import Post
+
+
+def request_cached(func):
+    """Результат func(request, ...) запоминается на request."""
+    attribute = f'_cached_{func.__module__}.{func.__qualname__}'
+
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        if not hasattr(request, attribute):
+            setattr(request, attribute, func(request, *args, **kwargs))
+        return getattr(request, attribute)
+    return wrapper
+
+
+def post_parts(post):
+    """Что карточка поста показывает, кроме самого поста.
+
+    Автор и группа учитываются, только если прочитаны вместе с постом:
+    API не читает их, когда поля не запрошены, и тогда они не видны.
+    """
+    parts = [post.id]
+    if Post.author.is_cached(post):
+        parts += [post.author.username, post.author.get_full_name()]
+    if Post.group.is_cached(post):
+        parts += [post.group and (post.group.slug, post.group.title)]
+    return parts
+
+
+def page_state(posts):
+    """Последняя правка постов, последний комментарий к ним и число
+    комментариев (удаление комментария не меняет времен)."""
+    ids = [post.id for post in posts]
+    if not ids:
+        return {'updated': None, 'commented': None, 'comments': 0}
+    return Post.objects.filter(id__in=ids).aggregate(
+        updated=Max('updated'),
+        commented=Max('comments__created'),
+        comments=Count('comments'),
+    )
+
+
+def conditional_page(page_posts, extra_parts=None):
+    """Декоратор view: ETag, 304 и заголовки кэширования.
+
+    `page_posts(request, *args, **kwargs)` возвращает посты страницы,
+    `extra_parts(request, *args, **kwargs)` — то, что еще меняет
+    страницу (счетчики подписок и т. п.).
+    """
+    def decorator(view):
+        def etag_func(request, *args, **kwargs):
+            posts = list(page_posts(request, *args, **kwargs))
+            state = page_state(posts)
+            parts = ()
+            if extra_parts is not None:
+                parts = extra_parts(request, *args, **kwargs)
+            viewer = (request.user.pk if request.user.is_authenticated
+                      else '')
+            raw = '|'.join(str(part) for part in (
+                request.get_full_path(), viewer,
+                [post_parts(post) for post in posts],
+                state['updated'], state['commented'], state['comments'],
+                *parts))
+            return hashlib.md5(raw.encode()).hexdigest()
+
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Браузер и прокси хранят ответ, но каждый раз сверяют ETag;
+            # страницы вошедшего пользователя — только в браузере
+            patch_cache_control(
+                response, max_age=0, must_revalidate=True,
+                **({'private': True} if request.user.is_authenticated
+                   else {'public': True}),
+            )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,156 @@
+"""Денормализованные счетчики вместо COUNT(*) на каждый запрос.
+
+Счетчики обновляются сигналами (posts/signals.py). bulk_create и
+QuerySet.update() сигналов не отправляют — после них счетчики
+пересчитывает команда `manage.py recount`.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from .models import Comment, Counter, Follow, Post
+
+ALL_POSTS = 'posts'
+AUTHOR_POSTS = 'author_posts'
+GROUP_POSTS = 'group_posts'
+POST_COMMENTS = 'post_comments'
+FOLLOWERS = 'followers'
+FOLLOWING = 'following'
+
+# Счетчик: (запрос, поле группировки). Для ALL_POSTS object_id = 0.
+SOURCES = {
+    ALL_POSTS: (Post.objects.all, None),
+    AUTHOR_POSTS: (Post.objects.all, 'author_id'),
+    GROUP_POSTS: (Post.objects.all, 'group_id'),
+    POST_COMMENTS: (Comment.objects.all, 'post_id'),
+    FOLLOWERS: (Follow.objects.all, 'author_id'),
+    FOLLOWING: (Follow.objects.all, 'user_id'),
+}
+
+
+def live_count(name, object_id=0):
+    queryset, field = SOURCES[name]
+    queryset = queryset()
+    if field is not None:
+        queryset = queryset.filter(**{field: object_id})
+    return queryset.count()
+
+
+def recount(name, object_id=0):
+    value = live_count(name, object_id)
+    Counter.objects.update_or_create(
+        name=name, object_id=object_id, defaults={'value': value})
+    return value
+
+
+def get(name, object_id=0):
+    try:
+        return Counter.objects.values_list('value', flat=True).get(
+            name=name, object_id=object_id)
+    except Counter.DoesNotExist:
+        return recount(name, object_id)
+
+
+def get_many(*keys):
+    """Значения нескольких счетчиков `(name, object_id)` одним запросом."""
+    names = {name for name, _ in keys}
+    object_ids = {object_id for _, object_id in keys}
+    found = {
+        (name, object_id): value
+        for name, object_id, value in Counter.objects.filter(
+            name__in=names, object_id__in=object_ids,
+        ).values_list('name', 'object_id', 'value')
+    }
+    return [
+        found[key] if key in found else recount(*key)
+        for key in keys
+    ]
+
+
+def get_values(name, object_ids):
+    """{object_id: value} счетчиков одного вида одним запросом.
+
+    Строки может не быть: счетчик ни разу не менялся, объект создан до
+    появления счетчиков или строки удалены. Такие счетчики
+    пересчитываются группирующим запросом (recount_many()) и
+    заводятся, так что следующий вызов их уже найдет."""
+    values = dict(Counter.objects.filter(
+        name=name, object_id__in=object_ids,
+    ).values_list('object_id', 'value'))
+    missing = set(object_ids) - set(values)
+    if missing:
+        values.update(recount_many(name, missing))
+    return values
+
+
+def change(name, object_id, delta):
+    if object_id is None:
+        return
+    counter = Counter.objects.filter(name=name, object_id=object_id)
+    with transaction.atomic():
+        if counter.update(value=F('value') + delta):
+            return
+        # Счетчика еще нет: живой COUNT(*) уже учитывает изменение.
+        # Если строку успел создать другой обработчик, его COUNT(*)
+        # нашего изменения не видел — применяем его к готовой строке.
+        _, created = Counter.objects.get_or_create(
+            name=name, object_id=object_id,
+            defaults={'value': live_count(name, object_id)})
+        if not created:
+            counter.update(value=F('value') + delta)
+
+
+def discard(name, object_id):
+    Counter.objects.filter(name=name, object_id=object_id).delete()
+
+
+def recount_many(name, object_ids, batch_size=500):
+    """recount() для многих объектов одного вида: один группирующий
+    запрос на пачку. Нужен после bulk_create, который обходит сигналы,
+    когда пересчитывать все счетчики незачем. Возвращает
+    {object_id: value}."""
+    queryset, field = SOURCES[name]
+    object_ids = sorted(set(object_ids) - {None})
+    counted = {}
+    for start in range(0, len(object_ids), batch_size):
+        chunk = object_ids[start:start + batch_size]
+        values = dict(
+            queryset().filter(**{f'{field}__in': chunk})
+            .order_by().values(field).annotate(value=Count('pk'))
+            .values_list(field, 'value')
+        )
+        with transaction.atomic():
+            Counter.objects.filter(name=name, object_id__in=chunk).delete()
+            Counter.objects.bulk_create(
+                Counter(name=name, object_id=object_id,
+                        value=values.get(object_id, 0))
+                for object_id in chunk)
+        counted.update(
+            (object_id, values.get(object_id, 0)) for object_id in chunk)
+    return counted
+
+
+def recount_all(batch_size=1000):
+    """Пересчитывает все счетчики группирующими запросами."""
+    counters = []
+    for name, (queryset, field) in SOURCES.items():
+        if field is None:
+            counters.append(Counter(name=name, object_id=0,
+                                    value=queryset().count()))
+            continue
+        rows = (
+            queryset().filter(**{f'{field}__isnull': False})
+            .order_by().values(field).annotate(value=Count('pk'))
+        )
+        counters.extend(
+            Counter(name=name, object_id=row[field], value=row['value'])
+            for row in rows.iterator()
+        )
+    # Django 2.2 не ограничивает пачку пределом SQLite на число строк
+    # в одном INSERT — ограничиваем сами
+    fields = [field for field in Counter._meta.concrete_fields
+              if not field.primary_key]
+    batch_size = min(batch_size, max(
+        connection.ops.bulk_batch_size(fields, counters), 1))
+    Counter.objects.all().delete()
+    Counter.objects.bulk_create(counters, batch_size=batch_size)
+    return len(counters)
@@ -0,0 +1,46 @@
+"""Запросы лент постов.
+
+Все ленты отдаются через этот модуль: автор и группа подтягиваются
+одним JOIN вместо отдельного запроса на каждую карточку, а колонки,
+которые карточка поста не показывает, не читаются.
+"""
+from . import timeline
+from .models import Post, TimelineEntry
+
+FEED_RELATED = ('author', 'group')
+# Колонки связанных моделей, которые не нужны карточке поста
+FEED_DEFERRED = (
+    'author__password',
+    'author__email',
+    'group__description',
+)
+
+
+def feed_queryset(queryset, prefix=''):
+    return queryset.select_related(
+        *(prefix + field for field in FEED_RELATED)
+    ).defer(
+        *(prefix + field for field in FEED_DEFERRED)
+    )
+
+
+def index_feed():
+    return feed_queryset(Post.objects.all())
+
+
+def group_feed(group):
+    return feed_queryset(group.posts.all())
+
+
+def profile_feed(author):
+    return feed_queryset(author.posts.all())
+
+
+def timeline_feed(user):
+    return feed_queryset(TimelineEntry.objects.filter(user=user),
+                         prefix='post__')
+
+
+def follow_feed(user):
+    """Записи ленты подписок; пост доступен как `entry.post`."""
+    return timeline.feed(user, timeline_feed(user), index_feed())
@@ -8,6 +8,16 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ошибки, из-за которых файл отброшен еще при приеме
+        self.upload_errors = upload_errors or {}
+
+    def clean_image(self):
+        if 'image' in self.upload_errors:
+            raise forms.ValidationError(self.upload_errors['image'])
+        return self.cleaned_data['image']
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,111 @@
+import json
+import os
+import platform
+import tempfile
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmark, seeding
+from posts.models import Post
+
+# Кэш на время замеров — свой, чтобы cache.clear() не задел общий
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = ('Бенчмарк всех адресов posts/urls.py на засеянной базе: '
+            'p50/p95, запросы к базе, пиковая память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=seeding.SCALES,
+                            default='small')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--database',
+                            help='Файл базы бенчмарка; по умолчанию во '
+                                 'временном каталоге, свой для scale и seed')
+        parser.add_argument('--reseed', action='store_true',
+                            help='Пересоздать базу, даже если она есть')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого запуска для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост p95, доля (0.2 — 20%%)')
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        path = options['database'] or os.path.join(
+            tempfile.gettempdir(),
+            f'yatube-benchmark-{scale}-{options["seed"]}.sqlite3')
+        if options['reseed'] and os.path.exists(path):
+            os.remove(path)
+        # Отдельная база: рабочие данные не трогаются. Соединение
+        # переключается на файл path до конца команды
+        connection.close()
+        name = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = path
+        try:
+            results = self.run_benchmark(path, scale, options)
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = name
+        report = {
+            'meta': {
+                'scale': scale,
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': connection.Database.sqlite_version,
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            self.check_baseline(report, options['baseline'],
+                                options['tolerance'])
+
+    def run_benchmark(self, path, scale, options):
+        call_command('migrate', verbosity=0, interactive=False)
+        if not Post.objects.exists():
+            self.stdout.write(f'Заполнение базы {path} ({scale})')
+            counts = seeding.seed(**seeding.SCALES[scale],
+                                  seed=options['seed'],
+                                  log=self.stdout.write)
+            self.stdout.write(f'Создано: {counts}')
+        with override_settings(CACHES=BENCHMARK_CACHES,
+                               METRICS_SAMPLE_RATE=0):
+            return benchmark.run(
+                benchmark.build_scenarios(), options['iterations'],
+                log=self.report)
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<20} p50 {result["p50_ms"]:8.2f} мс  '
+            f'p95 {result["p95_ms"]:8.2f} мс  '
+            f'запросов {result["queries"]:3}  '
+            f'память {result["peak_mb"]:7.2f} МБ'
+        )
+
+    def check_baseline(self, report, path, tolerance):
+        with open(path, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('meta', {}).get('scale') != report['meta']['scale']:
+            self.stderr.write('Базовый запуск сделан на другом scale')
+        regressions = benchmark.compare(
+            report['results'], baseline['results'], tolerance)
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно baseline:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
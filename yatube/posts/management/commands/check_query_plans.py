@@ -0,0 +1,95 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts import counters, feeds, search, timeline
+from posts.models import Counter, Follow, Group, Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса или сортировка во временном B-дереве
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+def page_queries(name, queryset, ordering=('-pub_date', '-id')):
+    """Запросы страницы ленты: по номеру и по курсору в обе стороны."""
+    paginator = CursorPaginator(queryset, settings.PAGE_COUNT,
+                                ordering=ordering)
+    values = [timezone.now(), 1]
+    yield name, paginator.object_list[:settings.PAGE_COUNT]
+    for direction, reverse in (('after', False), ('before', True)):
+        cursor_queryset = paginator.object_list.filter(
+            paginator.keyset_filter(values, reverse))
+        if reverse:
+            cursor_queryset = cursor_queryset.reverse()
+        yield (f'{name} ({direction})',
+               cursor_queryset[:settings.PAGE_COUNT + 1])
+
+
+def feed_queries():
+    """Запросы, которые выполняют представления posts/views.py."""
+    user = User(pk=1)
+    group = Group(pk=1)
+    post = Post(pk=1)
+    yield from page_queries('index', feeds.index_feed())
+    yield from page_queries('group_posts', feeds.group_feed(group))
+    yield from page_queries('profile', feeds.profile_feed(user))
+    yield from page_queries('follow_index', feeds.timeline_feed(user),
+                            ordering=timeline.ORDERING)
+    yield 'post_detail comments', post.comments.select_related('author')
+    yield 'profile following', Follow.objects.filter(
+        author=user, user=user).values('id')[:1]
+    yield 'counters', Counter.objects.filter(
+        name=counters.AUTHOR_POSTS, object_id=1).values('value')
+    yield 'timeline pull', Counter.objects.filter(
+        name=counters.FOLLOWERS,
+        object_id__in=Follow.objects.filter(user=user).values('author_id'),
+        value__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values('object_id')
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = ('Проверяет планы запросов лент: без полного прохода '
+            'по таблице и без сортировки во временном B-дереве; '
+            'и что триггеры поискового индекса на месте')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживается для SQLite')
+        failures = []
+        for name, queryset in feed_queries():
+            plan = explain(queryset)
+            bad = [
+                step for step in plan
+                if FULL_SCAN.search(step) or TEMP_SORT.search(step)
+            ]
+            style = self.style.ERROR if bad else self.style.SUCCESS
+            self.stdout.write(style(name))
+            for step in plan:
+                self.stdout.write(f'    {step}')
+            if bad:
+                failures.append(name)
+        # Пересоздание posts_post в SQLite (AlterField) удаляет триггеры,
+        # и поиск молча перестает видеть новые посты
+        missing = search.missing_objects()
+        if missing:
+            self.stdout.write(self.style.ERROR(
+                'Поисковый индекс: нет ' + ', '.join(missing)
+                + ' (manage.py rebuild_search_index)'))
+            failures.append('search index')
+        if failures:
+            raise CommandError(
+                'Запросы без подходящего индекса: ' + ', '.join(failures))
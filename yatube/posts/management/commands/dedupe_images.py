@@ -0,0 +1,62 @@
+import posixpath
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import thumbnails
+from posts.cache import bump_generation
+from posts.models import Post, ThumbnailJob
+from posts.storage import ROOT, hashed_name, is_hashed_name
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов на адреса по хешу содержимого '
+            'и удаляет одинаковые копии')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=ROOT)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не менять')
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        dry_run = options['dry_run']
+        moved = duplicates = freed = 0
+        for name in self.walk(storage, options['directory']):
+            if is_hashed_name(name):
+                # Уже на своем адресе: повторный запуск ничего не меняет
+                continue
+            with storage.open(name) as content:
+                target = hashed_name(name, content)
+                if target == name:
+                    continue
+                if storage.exists(target):
+                    duplicates += 1
+                    freed += storage.size(name)
+                else:
+                    moved += 1
+                    if not dry_run:
+                        storage.save(name, content)
+                if dry_run:
+                    continue
+            Post.objects.filter(image=name).update(
+                image=target, updated=timezone.now())
+            ThumbnailJob.objects.get_or_create(image=target)
+            thumbnails.release(name)
+        if moved or duplicates:
+            bump_generation()
+        action = 'Будет перенесено' if dry_run else 'Перенесено'
+        self.stdout.write(
+            f'{action}: {moved}, удалено дубликатов: '
+            f'{duplicates}, освобождено байт: {freed}'
+        )
+
+    def walk(self, storage, directory):
+        if not storage.exists(directory):
+            return
+        directories, files = storage.listdir(directory)
+        for name in sorted(files):
+            yield posixpath.join(directory, name)
+        for subdirectory in sorted(directories):
+            yield from self.walk(
+                storage, posixpath.join(directory, subdirectory))
@@ -0,0 +1,35 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в NDJSON '
+            '(.gz — со сжатием)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='Файл выгрузки; по умолчанию stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Строк, читаемых из базы за раз')
+
+    def handle(self, *args, **options):
+        output = open_output(options['path'])
+        try:
+            written = transfer.export(output, options['chunk_size'])
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        # stdout может быть занят самой выгрузкой
+        self.stderr.write(f'Выгружено: {written}')
@@ -0,0 +1,42 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+def open_input(path):
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из NDJSON '
+            'выгрузки export_content')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='Файл выгрузки; по умолчанию stdin')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Строк в одной транзакции')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        try:
+            lines = open_input(options['path'])
+        except OSError as error:
+            raise CommandError(error)
+        try:
+            created = transfer.load(lines, options['batch_size'],
+                                    log=self.stdout.write)
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+        self.stdout.write(self.style.SUCCESS(f'Создано: {created}'))
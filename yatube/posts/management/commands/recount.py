@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = counters.recount_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано счетчиков: {total}'))
@@ -0,0 +1,111 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+# Файл состояния по умолчанию — в MEDIA_ROOT, рядом с миниатюрами
+STATE_FILE = '.regenerate_thumbnails'
+
+
+def render(name, force=False):
+    """Выполняется в дочернем процессе; ошибка одной картинки не
+    останавливает весь проход."""
+    try:
+        return name, thumbnails.render(name, force)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        return name, None
+
+
+class Command(BaseCommand):
+    help = ('Пересоздает миниатюры всех картинок постов. '
+            'Прерванный проход продолжается с места остановки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Число процессов; 0 — без пула')
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать и уже существующие файлы')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать сначала, не продолжая прошлый проход')
+        parser.add_argument(
+            '--state-file',
+            help=f'По умолчанию MEDIA_ROOT/{STATE_FILE}')
+
+    def handle(self, *args, **options):
+        state_file = (options['state_file']
+                      or os.path.join(settings.MEDIA_ROOT, STATE_FILE))
+        last = '' if options['restart'] else self.read_state(state_file)
+        if last:
+            self.stdout.write(f'Продолжаем после {last}')
+        images = (Post.objects.exclude(image='').order_by('image')
+                  .values_list('image', flat=True).distinct())
+        workers = options['workers']
+        executor = (ProcessPoolExecutor(workers, initializer=django.setup)
+                    if workers else None)
+        task = partial(render, force=options['force'])
+        done = failed = created = 0
+        changed = []
+        started = time.monotonic()
+        try:
+            while True:
+                chunk = list(images.filter(image__gt=last)
+                             [:options['chunk_size']])
+                if not chunk:
+                    break
+                if executor:
+                    results = executor.map(
+                        task, chunk,
+                        chunksize=max(1, len(chunk) // (workers * 4)))
+                else:
+                    results = map(task, chunk)
+                rendered = {name: result for name, result in results
+                            if result is not None}
+                changed.extend(thumbnails.store(rendered))
+                last = chunk[-1]
+                self.write_state(state_file, last)
+                done += len(rendered)
+                failed += len(chunk) - len(rendered)
+                created += sum(result[2] for result in rendered.values())
+                self.report(done, failed, created, started)
+        finally:
+            if executor:
+                executor.shutdown()
+            # Посты и кэш лент обновляются один раз, и прерванный проход
+            # тоже обновляет посты уже готовых картинок
+            thumbnails.refresh_posts(changed)
+        if os.path.exists(state_file):
+            os.remove(state_file)
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def report(self, done, failed, created, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'Картинок: {done} (ошибок: {failed}), миниатюр: {created}, '
+            f'{done / elapsed:.1f} картинок/с, '
+            f'{created / elapsed:.1f} миниатюр/с'
+        )
+
+    def read_state(self, path):
+        try:
+            with open(path, encoding='utf-8') as state:
+                return state.read().strip()
+        except FileNotFoundError:
+            return ''
+
+    def write_state(self, path, last):
+        # Запись через временный файл: обрыв не оставит обрезанное имя
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as state:
+            state.write(last)
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import seeding
+
+MODELS = ('users', 'groups', 'posts', 'follows', 'comments')
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, подписками и комментариями со степенным '
+            'распределением активности')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=seeding.SCALES,
+                            default='small',
+                            help='Готовый набор размеров')
+        for name in MODELS:
+            parser.add_argument(f'--{name}', type=int,
+                                help='Переопределяет размер из --scale')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--exponent', type=float,
+                            default=seeding.EXPONENT,
+                            help='Показатель степенного распределения')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Строк в одной транзакции')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        sizes = dict(seeding.SCALES[options['scale']])
+        sizes.update((name, options[name]) for name in MODELS
+                     if options[name] is not None)
+        try:
+            seeding.check_sizes(**sizes)
+        except ValueError as exc:
+            raise CommandError(exc)
+        started = time.monotonic()
+        created = seeding.seed(
+            **sizes, seed=options['seed'], exponent=options['exponent'],
+            batch_size=options['batch_size'], log=self.stdout.write)
+        elapsed = time.monotonic() - started
+        rows = sum(created.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {created} за {elapsed:.1f} с '
+            f'({rows / elapsed * 60:.0f} строк в минуту)'))
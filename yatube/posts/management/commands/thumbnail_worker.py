@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Фоновый обработчик очереди миниатюр картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=1,
+                            help='Пауза между опросами пустой очереди, с')
+        parser.add_argument('--once', action='store_true',
+                            help='Обработать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            jobs = thumbnails.due_jobs(options['batch_size'])
+            if jobs:
+                done = thumbnails.process(jobs)
+                self.stdout.write(f'Обработано картинок: {done}, '
+                                  f'отложено: {len(jobs) - done}')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
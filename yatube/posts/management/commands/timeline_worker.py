@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = ('Фоновый обработчик очереди лент: раскладывает посты авторов, '
+            'вышедших из режима pull, по лентам подписчиков')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--interval', type=float, default=1,
+                            help='Пауза между опросами пустой очереди, с')
+        parser.add_argument('--once', action='store_true',
+                            help='Обработать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            jobs = timeline.due_jobs(options['batch_size'])
+            if jobs:
+                done = timeline.process(jobs)
+                self.stdout.write(f'Обработано авторов: {done}')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Counter, Group, Post
+
+User = get_user_model()
+
+
+def warm_urls(pages, profiles):
+    """Первые страницы главной, лента каждой группы и профили авторов
+    с наибольшим числом постов."""
+    index = reverse('posts:index')
+    urls = [index] + [f'{index}?page={number}'
+                      for number in range(2, pages + 1)]
+    urls.extend(reverse('posts:group_list', args=(slug,))
+                for slug in Group.objects.values_list('slug', flat=True))
+    author_ids = list(
+        Counter.objects.filter(name=counters.AUTHOR_POSTS, value__gt=0)
+        .order_by('-value').values_list('object_id', flat=True)[:profiles]
+    )
+    if len(author_ids) < profiles:
+        # Счетчики заводятся при первом чтении: у авторов, чьи профили
+        # еще не открывали, их нет — таких считаем по постам
+        author_ids.extend(
+            Post.objects.exclude(author_id__in=author_ids)
+            .values('author_id').annotate(posts=Count('id'))
+            .order_by('-posts').values_list('author_id', flat=True)
+            [:profiles - len(author_ids)]
+        )
+    usernames = dict(User.objects.filter(
+        pk__in=author_ids).values_list('pk', 'username'))
+    urls.extend(reverse('posts:profile', args=(usernames[author_id],))
+                for author_id in author_ids if author_id in usernames)
+    return urls
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def get_handler():
+    """Цепочка middleware проекта, как у WSGI-обработчика сервера."""
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            handler = BaseHandler()
+            handler.load_middleware()
+            _handler = handler
+    return _handler
+
+
+def render(url, host):
+    # Анонимный запрос проходит весь стек: и фрагменты, и кэш страниц
+    started = time.monotonic()
+    request = RequestFactory(HTTP_HOST=host).get(url)
+    response = get_handler().get_response(request)
+    return url, response.status_code, time.monotonic() - started
+
+
+def render_in_thread(url, host):
+    try:
+        return render(url, host)
+    finally:
+        # У каждого потока свое соединение с базой
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Прогревает кэш лент после деплоя или перезапуска'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3,
+                            help='Сколько первых страниц главной')
+        parser.add_argument('--profiles', type=int, default=20,
+                            help='Сколько самых активных профилей')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--host', default=settings.ALLOWED_HOSTS[0])
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            self.stderr.write(
+                'LocMemCache свой у каждого процесса: прогрев из команды '
+                'не дойдет до воркеров сервера (см. CACHE_BACKEND)')
+        urls = warm_urls(options['pages'], options['profiles'])
+        started = time.monotonic()
+        workers = options['workers']
+        if workers > 1:
+            with ThreadPoolExecutor(workers) as executor:
+                results = list(executor.map(
+                    render_in_thread, urls, [options['host']] * len(urls)))
+        else:
+            results = [render(url, options['host']) for url in urls]
+        for url, status, elapsed in results:
+            self.stdout.write(f'{status} {elapsed * 1000:8.1f} мс  {url}')
+        self.stdout.write(
+            f'Страниц: {len(results)}, '
+            f'всего {time.monotonic() - started:.2f} с')
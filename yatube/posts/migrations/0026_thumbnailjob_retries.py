@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='next_attempt',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
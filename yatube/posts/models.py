@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from .storage import post_image_storage
 
 User = get_user_model()
 
@@ -19,6 +22,8 @@ class Post(models.Model):
         help_text='Введите текст поста'
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    # Версия поста для кэша карточки: меняется при каждом сохранении
+    updated = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='posts')
     group = models.ForeignKey(Group, on_delete=models.SET_NULL,
@@ -29,13 +34,25 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы под сортировку лент (см. check_query_plans)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date'),
+            # Подсчет ссылок на файл картинки (posts/storage.py)
+            models.Index(fields=['image'], name='post_image'),
+        ]
 
     def __str__(self):
         return self.text
@@ -52,9 +69,104 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='comments')
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='unique_follow'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    # Копия Post.pub_date: лента читается одним диапазоном по индексу
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date'),
+            models.Index(fields=['user', 'author', '-pub_date'],
+                         name='timeline_user_author'),
+        ]
+
+
+class TimelineJob(models.Model):
+    """Автор, посты которого фоновый обработчик еще не разложил по
+    лентам подписчиков после выхода из режима pull.
+
+    Пока задание в очереди, лента читает посты автора из Post, как
+    у авторов в режиме pull (см. posts/timeline.py).
+    """
+    author = models.OneToOneField(User, on_delete=models.CASCADE,
+                                  related_name='+')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created']
+
+    def __str__(self):
+        return str(self.author_id)
+
+
+class Counter(models.Model):
+    """Денормализованный счетчик: постов, комментариев, подписчиков.
+
+    Строка создается при первом обращении по живому COUNT(*),
+    дальше поддерживается сигналами (см. posts/counters.py).
+    """
+    name = models.CharField(max_length=32)
+    object_id = models.PositiveIntegerField()
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('name', 'object_id'),
+                                    name='unique_counter'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}:{self.object_id}={self.value}'
+
+
+class ThumbnailJob(models.Model):
+    """Картинка, для которой фоновый обработчик еще не создал миниатюры.
+
+    Неудачная попытка оставляет задание в очереди с текстом ошибки:
+    оно повторяется не раньше next_attempt, пока не кончатся попытки.
+    """
+    image = models.CharField(max_length=255, unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created']
+
+    def __str__(self):
+        return self.image
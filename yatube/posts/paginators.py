@@ -0,0 +1,173 @@
+from django.conf import settings
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+CURSOR_SEPARATOR = '|'
+# Параметры запроса для перехода к более старым и более новым записям
+AFTER = 'after'
+BEFORE = 'before'
+
+
+class CursorPage(Page):
+    """Страница по курсору: номера у нее нет.
+
+    Есть ли соседние страницы, известно из самой выборки (лишняя
+    строка), поэтому has_next/has_previous хранятся явно. Вместо
+    номеров соседних страниц — ссылки next_query/previous_query.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor, has_next,
+                 has_previous):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Page {self.cursor}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        raise InvalidPage('У страницы по курсору нет номера')
+
+    def previous_page_number(self):
+        raise InvalidPage('У страницы по курсору нет номера')
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу сортировки (keyset).
+
+    Для неглубоких страниц работает как обычный Paginator (`?page=N`),
+    а страницы «старее/новее» отдает по курсору `(pub_date, id)`
+    без OFFSET и без COUNT(*): запрос сводится к поиску по индексу.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id'), count=None, **kwargs):
+        self.ordering = tuple(ordering)
+        self.field_names = tuple(
+            field.lstrip('-') for field in self.ordering)
+        super().__init__(object_list.order_by(*self.ordering),
+                         per_page, **kwargs)
+        if count is not None:
+            # Готовый счетчик вместо COUNT(*) (см. posts/counters.py)
+            self.__dict__['count'] = count
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, name) for name in self.field_names]
+        raw = CURSOR_SEPARATOR.join(
+            value.isoformat() if hasattr(value, 'isoformat') else str(value)
+            for value in values
+        )
+        return urlsafe_base64_encode(force_bytes(raw))
+
+    def decode_cursor(self, cursor):
+        opts = self.object_list.model._meta
+        try:
+            raw = force_str(urlsafe_base64_decode(cursor))
+            parts = raw.split(CURSOR_SEPARATOR)
+            if len(parts) != len(self.field_names):
+                raise ValueError(raw)
+            values = [
+                opts.get_field(name).to_python(part)
+                for name, part in zip(self.field_names, parts)
+            ]
+        except Exception:
+            raise InvalidPage('Некорректный курсор')
+        if any(value is None for value in values):
+            raise InvalidPage('Некорректный курсор')
+        return values
+
+    def keyset_filter(self, values, reverse=False):
+        """Условие «строго после курсора» в порядке сортировки.
+
+        Первое поле вынесено отдельным диапазоном, чтобы SQLite искал
+        по индексу, а не разворачивал OR в несколько поисков с сортировкой.
+        """
+        first_descending = self.ordering[0].startswith('-') != reverse
+        bound = Q(**{
+            f'{self.field_names[0]}__{"lte" if first_descending else "gte"}':
+                values[0]
+        })
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            name = self.field_names[position]
+            descending = field.startswith('-') != reverse
+            lookup = f'{name}__{"lt" if descending else "gt"}'
+            equal = dict(zip(self.field_names[:position], values[:position]))
+            condition |= Q(**equal, **{lookup: values[position]})
+        return bound & condition
+
+    def cursor_page(self, cursor, direction=AFTER):
+        values = self.decode_cursor(cursor)
+        reverse = direction == BEFORE
+        queryset = self.object_list.filter(
+            self.keyset_filter(values, reverse))
+        if reverse:
+            queryset = queryset.reverse()
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if reverse:
+            object_list.reverse()
+        has_older = bool(object_list) and (has_more or reverse)
+        has_newer = bool(object_list) and (has_more or not reverse)
+        page = CursorPage(object_list, self, f'{direction}:{cursor}',
+                          has_next=has_older, has_previous=has_newer)
+        page.next_query = None
+        page.previous_query = None
+        if has_older:
+            page.next_query = f'{AFTER}={self.encode_cursor(object_list[-1])}'
+        if has_newer:
+            page.previous_query = (
+                f'{BEFORE}={self.encode_cursor(object_list[0])}')
+        return page
+
+    def numbered_page(self, number):
+        page = self.get_page(number)
+        page.is_cursor = False
+        page.cursor = ''
+        page.previous_query = None
+        page.next_query = None
+        if page.has_previous():
+            page.previous_query = f'page={page.previous_page_number()}'
+        shallow_pages = settings.PAGINATOR_SHALLOW_PAGES
+        if page.has_next():
+            if page.number < shallow_pages:
+                page.next_query = f'page={page.next_page_number()}'
+            else:
+                # Глубже переходим по курсору, без OFFSET
+                page.next_query = (
+                    f'{AFTER}={self.encode_cursor(page[-1])}')
+        page.page_links = range(
+            1, min(self.num_pages, shallow_pages) + 1)
+        return page
+
+
+def paginator_func(request, object, count_post,
+                   ordering=('-pub_date', '-id'), count=None):
+    paginator = CursorPaginator(object, count_post, ordering=ordering,
+                                count=count)
+    for direction in (AFTER, BEFORE):
+        cursor = request.GET.get(direction)
+        if cursor:
+            try:
+                return paginator.cursor_page(cursor, direction)
+            except InvalidPage:
+                break
+    return paginator.numbered_page(request.GET.get('page'))
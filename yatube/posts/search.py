@@ -0,0 +1,152 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс `posts_post_fts` — внешний контент для таблицы `posts_post`,
+синхронизируется триггерами, поэтому bulk_create и update() тоже
+попадают в поиск. SQLite пересоздает таблицу при изменении ее схемы
+и удаляет триггеры вместе со старой таблицей: миграции, которые
+меняют Post, должны снова создать их своим SQL (как 0025).
+Пропавшие триггеры находит `check_query_plans`, возвращает
+`rebuild_search_index`.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.encoding import force_bytes, force_str
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.safestring import mark_safe
+
+from . import feeds
+
+FTS_TABLE = 'posts_post_fts'
+# Служебные символы вокруг совпадений; в HTML превращаются в <mark>
+MARK_START = '\x02'
+MARK_END = '\x03'
+WORD = re.compile(r'\w+')
+
+TRIGGERS = ('posts_post_fts_ai', 'posts_post_fts_ad', 'posts_post_fts_au')
+# Миграции держат свою копию этого SQL: код приложения может меняться
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"text, content='posts_post', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS posts_post_fts_ai "
+    f"AFTER INSERT ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS posts_post_fts_ad "
+    f"AFTER DELETE ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS posts_post_fts_au "
+    f"AFTER UPDATE OF text ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+)
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def missing_objects(using=connection):
+    """Таблица индекса и триггеры, которых нет в базе."""
+    names = (FTS_TABLE, *TRIGGERS)
+    with using.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN (%s)'
+            % ', '.join(['%s'] * len(names)), names)
+        found = {row[0] for row in cursor.fetchall()}
+    return [name for name in names if name not in found]
+
+
+def rebuild():
+    """Создает недостающие таблицу и триггеры и заново заполняет
+    индекс."""
+    with connection.cursor() as cursor:
+        for sql in CREATE_SQL:
+            cursor.execute(sql)
+        cursor.execute(REBUILD_SQL)
+
+
+def match_expression(query):
+    """Запрос пользователя -> выражение MATCH: все слова, по префиксу."""
+    words = WORD.findall(query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching(queryset, query):
+    """Фильтр queryset постов по совпадению в индексе (для админки)."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (expression,),
+    ))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def encode_cursor(rank, post_id):
+    return urlsafe_base64_encode(force_bytes(f'{rank!r}|{post_id}'))
+
+
+def decode_cursor(cursor):
+    try:
+        rank, post_id = force_str(urlsafe_base64_decode(cursor)).split('|')
+        return float(rank), int(post_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def search(query, limit, cursor=None):
+    """Посты по релевантности (bm25) с подсвеченными фрагментами.
+
+    Возвращает `(posts, next_cursor)`; курсор — пара `(rank, id)`
+    последнего результата, следующая страница ищется без OFFSET.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return [], None
+    if not is_available():
+        posts = feeds.index_feed().filter(text__icontains=query)[:limit]
+        for post in posts:
+            post.snippet = post.text
+        return list(posts), None
+    sql = (
+        f"SELECT rowid, rank, snippet({FTS_TABLE}, 0, %s, %s, '…', 24) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    )
+    params = [MARK_START, MARK_END, expression]
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit + 1)
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    posts = feeds.index_feed().in_bulk([row[0] for row in rows])
+    results = []
+    for post_id, rank, snippet in rows:
+        post = posts.get(post_id)
+        if post is None:
+            continue
+        post.rank = rank
+        post.snippet = highlight(snippet)
+        results.append(post)
+    return results, next_cursor
@@ -0,0 +1,262 @@
+"""Детерминированный генератор больших наборов данных.
+
+Одинаковые параметры и `seed` дают одинаковые данные: бенчмарки
+(`manage.py benchmark`) и оценки железа (`manage.py seed_data`)
+сравнимы между запусками и машинами. Строки
+пишутся bulk_create пачками, минуя сигналы, поэтому после вставки
+счетчики пересчитываются, ленты подписок заполняются одним запросом
+(timeline.rebuild), а кэш лент и страниц сбрасывается, как после
+других массовых вставок (bulk.purge_pages).
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import bulk, counters, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'seed_'
+# Наборы данных для бенчмарков
+SCALES = {
+    'tiny': {'users': 50, 'groups': 5, 'posts': 500,
+             'follows': 1000, 'comments': 1000},
+    'small': {'users': 2000, 'groups': 20, 'posts': 20000,
+              'follows': 100000, 'comments': 60000},
+    'medium': {'users': 20000, 'groups': 100, 'posts': 200000,
+               'follows': 1000000, 'comments': 600000},
+    'large': {'users': 100000, 'groups': 200, 'posts': 1000000,
+              'follows': 5000000, 'comments': 3000000},
+}
+# Показатель степенного распределения активности (1 — закон Ципфа)
+EXPONENT = 1.0
+# Подписки добираются повторными проходами, пока проход дает хотя бы
+# такую долю новых пар (на проходах короче 1 / MIN_FOLLOW_YIELD доля
+# ничего не говорит), но не больше MAX_FOLLOW_ROUNDS проходов
+MIN_FOLLOW_YIELD = 0.01
+MAX_FOLLOW_ROUNDS = 100
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+# Посты равномерно распределены по году
+PERIOD = timedelta(days=365)
+WORDS = (
+    'кот', 'собака', 'город', 'утро', 'вечер', 'дорога', 'книга', 'море',
+    'лес', 'дом', 'работа', 'отпуск', 'поезд', 'кофе', 'дождь', 'солнце',
+    'друг', 'музыка', 'фильм', 'парк', 'снег', 'весна', 'осень', 'лето',
+    'зима', 'горы', 'река', 'мост', 'окно', 'письмо', 'праздник', 'ужин',
+)
+
+
+def words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+@contextmanager
+def manual_dates(*fields):
+    """Отключает auto_now/auto_now_add, чтобы даты задавал генератор."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def save(model, objects, batch_size):
+    """Вставляет объекты пачками, каждая пачка — своя транзакция."""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            _save_batch(model, batch)
+            batch = []
+    if batch:
+        _save_batch(model, batch)
+
+
+def _save_batch(model, batch):
+    with transaction.atomic():
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def power_law(rng, ids, exponent=EXPONENT):
+    """Выбор из `ids` по закону Ципфа: k-й по популярности выбирается
+    в k**exponent раз реже первого. Ранги раздаются в случайном порядке,
+    чтобы популярность не зависела от id. Из пустого `ids` выбирается
+    None."""
+    ids = list(ids)
+    if not ids:
+        return lambda: None
+    rng.shuffle(ids)
+    cum_weights = list(accumulate(
+        1 / rank ** exponent for rank in range(1, len(ids) + 1)))
+
+    def pick():
+        return rng.choices(ids, cum_weights=cum_weights)[0]
+    return pick
+
+
+def generate_users(count, start=0):
+    password = make_password(None)
+    for number in range(start, start + count):
+        yield User(username=f'{USERNAME_PREFIX}{number}',
+                   first_name=f'Автор {number}', password=password)
+
+
+def generate_groups(count, start=0):
+    for number in range(start, start + count):
+        yield Group(title=f'Группа {number}', slug=f'seed-group-{number}',
+                    description=f'Описание группы {number}')
+
+
+def generate_posts(rng, count, pick_author, pick_group):
+    step = PERIOD / max(count, 1)
+    for number in range(count):
+        pub_date = START + step * number
+        yield Post(
+            text=words(rng, rng.randint(5, 40)),
+            author_id=pick_author(),
+            group_id=pick_group() if rng.random() < 0.7 else None,
+            pub_date=pub_date,
+            updated=pub_date,
+        )
+
+
+def generate_follows(count, pick_reader, pick_author):
+    for _ in range(count):
+        user_id, author_id = pick_reader(), pick_author()
+        if user_id != author_id:
+            yield Follow(user_id=user_id, author_id=author_id)
+
+
+def generate_comments(rng, count, pick_post, pick_reader):
+    step = PERIOD / max(count, 1)
+    for number in range(count):
+        yield Comment(
+            text=words(rng, rng.randint(3, 15)),
+            post_id=pick_post(),
+            author_id=pick_reader(),
+            created=START + step * number,
+        )
+
+
+def seed_follows(count, pick_reader, pick_author, batch_size):
+    """Создает `count` новых подписок и возвращает, скольких не хватило.
+
+    Повторные пары отбрасывает уникальное ограничение, поэтому проходы
+    повторяются на недостающее число. Степенное распределение может
+    исчерпать пары популярных авторов — тогда проходы прекращаются."""
+    target = Follow.objects.count() + count
+    remaining = count
+    for _ in range(MAX_FOLLOW_ROUNDS):
+        if remaining <= 0:
+            break
+        save(Follow, generate_follows(remaining, pick_reader, pick_author),
+             batch_size)
+        left = target - Follow.objects.count()
+        if (remaining * MIN_FOLLOW_YIELD >= 1
+                and remaining - left < remaining * MIN_FOLLOW_YIELD):
+            return left
+        remaining = left
+    return max(remaining, 0)
+
+
+def check_sizes(users, groups, posts, follows, comments):
+    """ValueError, если размеры невозможно выполнить на этой базе."""
+    if min(users, groups, posts, follows, comments) < 0:
+        raise ValueError('Размеры не могут быть отрицательными')
+    existing = totals()
+    user_count = existing['users'] + users
+    if (posts or follows or comments) and not user_count:
+        raise ValueError('Нет пользователей: посты, подписки и комментарии '
+                         'некому создавать')
+    pairs = user_count * (user_count - 1) - existing['follows']
+    if follows > pairs:
+        raise ValueError(f'Подписок {follows}, а свободных пар '
+                         f'читатель—автор только {pairs}')
+    if comments and not existing['posts'] + posts:
+        raise ValueError('Нет постов: комментарии некуда добавлять')
+
+
+def totals():
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'follows': Follow.objects.count(),
+        'comments': Comment.objects.count(),
+    }
+
+
+@contextmanager
+def stage(log, title):
+    started = time.monotonic()
+    yield
+    log(f'{title} за {time.monotonic() - started:.1f} с')
+
+
+def seed(users, groups, posts, follows, comments, seed=0,
+         exponent=EXPONENT, batch_size=5000, backfill_size=None,
+         log=None):
+    """Добавляет в базу синтетические данные и возвращает, сколько
+    строк создано.
+
+    Активность степенная: немногие авторы пишут большую часть постов
+    и собирают большую часть подписчиков, немногие читатели подписываются
+    и комментируют больше остальных, обсуждения собираются вокруг
+    немногих постов. Уже существующие строки тоже участвуют. Если групп
+    нет, посты создаются без групп.
+    """
+    log = log or (lambda message: None)
+    check_sizes(users, groups, posts, follows, comments)
+    rng = random.Random(seed)
+    before = totals()
+    start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    with stage(log, f'Пользователи: {users}'):
+        save(User, generate_users(users, start), batch_size)
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    start = Group.objects.filter(slug__startswith='seed-group-').count()
+    with stage(log, f'Группы: {groups}'):
+        save(Group, generate_groups(groups, start), batch_size)
+    group_ids = list(Group.objects.order_by('id').values_list(
+        'id', flat=True))
+    # Популярные авторы и пишут больше, и собирают больше подписчиков
+    pick_author = power_law(rng, user_ids, exponent)
+    pick_reader = power_law(rng, user_ids, exponent)
+    with stage(log, f'Посты: {posts}'), \
+            manual_dates(Post._meta.get_field('pub_date'),
+                         Post._meta.get_field('updated')):
+        save(Post, generate_posts(rng, posts, pick_author,
+                                  power_law(rng, group_ids, exponent)),
+             batch_size)
+    with stage(log, f'Подписки: {follows}'):
+        shortfall = seed_follows(follows, pick_reader, pick_author,
+                                 batch_size)
+    if shortfall:
+        log(f'Подписок создано на {shortfall} меньше: при таком '
+            f'распределении новые пары читатель—автор почти не выпадают')
+    post_ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+    with stage(log, f'Комментарии: {comments}'), \
+            manual_dates(Comment._meta.get_field('created')):
+        save(Comment,
+             generate_comments(rng, comments,
+                               power_law(rng, post_ids, exponent),
+                               pick_reader),
+             batch_size)
+    with stage(log, 'Счетчики и ленты подписок'):
+        counters.recount_all()
+        timeline.rebuild(backfill_size)
+    # Посты, подписки и комментарии достались и старым строкам: могли
+    # измениться любой профиль, группа и пост
+    bulk.purge_pages(user_ids, group_ids, post_ids)
+    return {name: count - before[name] for name, count in totals().items()}
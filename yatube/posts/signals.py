@@ -0,0 +1,176 @@
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from core import page_cache
+
+from . import counters, thumbnails, timeline
+from .cache import (
+    bump_generation, group_post_paths, purge_group_pages, purge_post_pages,
+    purge_profile_pages)
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feed_cache(sender, **kwargs):
+    bump_generation()
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, update_fields=None, **kwargs):
+    # Прежние группа и картинка нужны только при правке этих полей
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {'group', 'image'} & set(
+            update_fields):
+        instance._previous_group_id = instance.group_id
+        instance._previous_image = instance.image.name
+        return
+    previous = Post.objects.filter(pk=instance.pk).values(
+        'group_id', 'image').first() or {}
+    instance._previous_group_id = previous.get('group_id')
+    instance._previous_image = previous.get('image')
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change(counters.ALL_POSTS, 0, 1)
+        counters.change(counters.AUTHOR_POSTS, instance.author_id, 1)
+        counters.change(counters.GROUP_POSTS, instance.group_id, 1)
+        return
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        counters.change(counters.GROUP_POSTS, previous_group_id, -1)
+        counters.change(counters.GROUP_POSTS, instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change(counters.ALL_POSTS, 0, -1)
+    counters.change(counters.AUTHOR_POSTS, instance.author_id, -1)
+    counters.change(counters.GROUP_POSTS, instance.group_id, -1)
+    counters.discard(counters.POST_COMMENTS, instance.id)
+
+
+@receiver(post_delete, sender=Group)
+def discard_group_counter(sender, instance, **kwargs):
+    counters.discard(counters.GROUP_POSTS, instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change(counters.POST_COMMENTS, instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change(counters.POST_COMMENTS, instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change(counters.FOLLOWERS, instance.author_id, 1)
+        counters.change(counters.FOLLOWING, instance.user_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change(counters.FOLLOWERS, instance.author_id, -1)
+    counters.change(counters.FOLLOWING, instance.user_id, -1)
+
+
+@receiver(post_delete, sender=Follow)
+def leave_pull_mode(sender, instance, **kwargs):
+    # Подключен после uncount_follow: счетчик подписчиков уже уменьшен
+    timeline.leave_pull_mode(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, created, **kwargs):
+    if created or instance.image != getattr(instance, '_previous_image', ''):
+        thumbnails.enqueue(instance)
+
+
+@receiver(post_save, sender=Post)
+def confirm_image_claim(sender, instance, **kwargs):
+    # Пост с уже загруженной картинкой сохранен: после фиксации на файл
+    # ссылается он сам, и отметка claim больше не нужна
+    name = instance.image.name
+    storage = instance.image.storage
+    if name and storage.take_claim(name):
+        transaction.on_commit(lambda: storage.unclaim(name))
+
+
+@receiver(post_save, sender=Post)
+def release_previous_image(sender, instance, created, **kwargs):
+    previous_image = getattr(instance, '_previous_image', '')
+    if not created and previous_image and instance.image != previous_image:
+        transaction.on_commit(lambda: thumbnails.release(previous_image))
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        # Файл удаляется только после фиксации транзакции и только
+        # если больше ни один пост на него не ссылается
+        transaction.on_commit(lambda: thumbnails.release(name))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_page_cache(sender, instance, **kwargs):
+    purge_post_pages(instance, getattr(instance, '_previous_group_id', None))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_page_cache(sender, instance, **kwargs):
+    page_cache.purge(
+        page_cache.page_path('posts:post_detail', instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_page_cache(sender, instance, **kwargs):
+    purge_profile_pages(instance.user, instance.author)
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_pages(sender, instance, **kwargs):
+    instance._post_paths = group_post_paths(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_page_cache(sender, instance, **kwargs):
+    paths = getattr(instance, '_post_paths', None)
+    if paths is None:
+        paths = group_post_paths(instance)
+    purge_group_pages(instance, paths)
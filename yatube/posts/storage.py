@@ -0,0 +1,123 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл сохраняется под именем `posts/ab/cd/<sha256><расширение>`, поэтому
+одна и та же картинка, загруженная многими пользователями, лежит на
+диске один раз и получает один набор миниатюр. Удаляет файл
+`thumbnails.release()` — когда на него не ссылается ни один пост.
+
+Загрузка картинки, которая уже есть на диске, «занимает» файл (claim):
+пока пост с ней не сохранен, release() файл не удаляет, даже если
+прежние посты с этой картинкой уже удалены.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import threading
+
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Каталог адресов по содержимому; совпадает с upload_to поля Post.image
+ROOT = 'posts'
+HASHED_NAME = re.compile(
+    rf'^{ROOT}/([0-9a-f]{{2}})/([0-9a-f]{{2}})/(\1\2[0-9a-f]{{60}})'
+    r'(\.[^/.]*)?$')
+# Сколько секунд занятый файл защищен от удаления, если пост так и не
+# сохранился (ошибка формы, откат транзакции)
+CLAIM_TIMEOUT = 60
+
+# Файлы, занятые в этом потоке, но еще не подтвержденные постом
+_pending = threading.local()
+
+
+def content_hash(content):
+    """SHA-256 содержимого; файл читается по частям, целиком в память
+    не попадает."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(name, content):
+    extension = posixpath.splitext(name)[1].lower()
+    digest = content_hash(content)
+    return posixpath.join(ROOT, digest[:2], digest[2:4], digest + extension)
+
+
+def is_hashed_name(name):
+    """Лежит ли файл по адресу, построенному hashed_name().
+
+    Содержимое такого файла не меняется, поэтому его не нужно читать
+    заново, чтобы проверить адрес."""
+    return HASHED_NAME.match(name) is not None
+
+
+def claim_key(name):
+    return 'posts:image_claim:' + hashlib.md5(name.encode()).hexdigest()
+
+
+@deconstructible
+class HashedFileSystemStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content)
+        # Отметка ставится до проверки: release() либо увидит ее, либо
+        # уберет файл раньше проверки, и тогда он будет записан заново
+        self.claim(name)
+        if self.exists(name):
+            # Такая картинка уже загружена — второй копии не нужно
+            if not hasattr(_pending, 'names'):
+                _pending.names = set()
+            _pending.names.add(name)
+            return name
+        self.unclaim(name)
+        return super().save(name, content, max_length=max_length)
+
+    def claim(self, name):
+        key = claim_key(name)
+        cache.add(key, 0, CLAIM_TIMEOUT)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, CLAIM_TIMEOUT)
+
+    def unclaim(self, name):
+        try:
+            cache.decr(claim_key(name))
+        except ValueError:
+            pass
+
+    def take_claim(self, name):
+        """Снимает с потока отметку о занятом файле name; True, если
+        она была. Вызывается, когда пост с картинкой сохранен."""
+        names = getattr(_pending, 'names', set())
+        if name in names:
+            names.discard(name)
+            return True
+        return False
+
+    def is_claimed(self, name):
+        return (cache.get(claim_key(name)) or 0) > 0
+
+    def detach(self, name):
+        """Переносит файл с его адреса во временное имя и возвращает
+        это имя (None, если файла уже нет)."""
+        detached = f'{name}.released'
+        try:
+            os.replace(self.path(name), self.path(detached))
+        except FileNotFoundError:
+            return None
+        return detached
+
+    def restore(self, detached, name):
+        os.replace(self.path(detached), self.path(name))
+
+
+post_image_storage = HashedFileSystemStorage()
@@ -0,0 +1,52 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from posts.cache import get_or_refresh
+
+register = template.Library()
+
+
+class StaleCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on, version):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        version = self.version.resolve(context) if self.version else None
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_refresh(key, lambda: self.nodelist.render(context),
+                              int(timeout), version=version)
+
+
+@register.tag
+def stale_cache(parser, token):
+    """Как {% cache %}, но устаревший фрагмент отдается, пока его
+    пересчитывает один обработчик (posts.cache.get_or_refresh).
+
+        {% stale_cache timeout name [vary_on ...] [version=expr] %}
+        ...
+        {% endstale_cache %}
+
+    Смена `version` делает фрагмент устаревшим, не меняя ключ.
+    """
+    nodelist = parser.parse(('endstale_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments.")
+    version = None
+    if tokens[-1].startswith('version='):
+        version = parser.compile_filter(tokens.pop()[len('version='):])
+    return StaleCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        version,
+    )
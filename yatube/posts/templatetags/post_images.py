@@ -0,0 +1,50 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+def picture(post, alias):
+    return thumbnails.picture(post.image, alias, post.updated.isoformat())
+
+
+@register.simple_tag
+def post_thumbnail(post, alias='card'):
+    """URL миниатюры, а пока она готовится в фоне — URL оригинала."""
+    if not post.image:
+        return ''
+    url, _ = picture(post, alias)
+    return url or post.image.url
+
+
+@register.inclusion_tag('posts/includes/post_picture.html')
+def post_picture(post, alias='card', css_class='card-img my-2'):
+    """<picture> с вариантами миниатюры в srcset и ленивой загрузкой."""
+    context = {
+        'css_class': css_class,
+        'src': '',
+        'sizes': settings.POST_THUMBNAIL_SIZES,
+        'sources': [],
+        'srcset': '',
+    }
+    if not post.image:
+        return context
+    url, variants = picture(post, alias)
+    context['src'] = url or post.image.url
+    formats = [format_ for format_ in settings.POST_THUMBNAIL_FORMATS
+               if format_ in variants]
+    srcsets = {
+        format_: ', '.join(f'{url} {width}w'
+                           for width, url in variants[format_])
+        for format_ in formats
+    }
+    if formats:
+        # Последний формат — у самого тега <img>, остальные — в <source>
+        context['srcset'] = srcsets[formats[-1]]
+        context['sources'] = [
+            (f'image/{format_.lower()}', srcsets[format_])
+            for format_ in formats[:-1]
+        ]
+    return context
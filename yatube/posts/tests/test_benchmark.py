@@ -0,0 +1,137 @@
+import random
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import get_resolver, reverse
+
+from posts import benchmark, seeding  # isort:skip
+from posts.models import (  # isort:skip
+    Comment, Follow, Post, TimelineEntry)
+from posts.urls import urlpatterns  # isort:skip
+
+User = get_user_model()
+
+
+class SeedingTests(TestCase):
+    def test_same_seed_gives_same_posts(self):
+        def texts(seed):
+            rng = random.Random(seed)
+            return [
+                (post.text, post.author_id, post.group_id)
+                for post in seeding.generate_posts(
+                    rng, 20, seeding.power_law(rng, [1, 2, 3]),
+                    seeding.power_law(rng, [1, 2]))
+            ]
+        self.assertEqual(texts(1), texts(1))
+        self.assertNotEqual(texts(1), texts(2))
+
+    def test_power_law_favours_few_ids(self):
+        pick = seeding.power_law(random.Random(0), range(100))
+        picks = Counter(pick() for _ in range(10000))
+        top = sum(count for _, count in picks.most_common(10))
+        # Первые 10 из 100 по закону Ципфа — больше половины выборки
+        self.assertGreater(top, 5000)
+
+    def test_power_law_from_empty_ids(self):
+        self.assertIsNone(seeding.power_law(random.Random(0), [])())
+
+    def test_impossible_sizes_are_rejected(self):
+        cases = (
+            ('--users', '0', '--posts', '10'),
+            ('--users', '3', '--follows', '7'),
+            ('--users', '3', '--posts', '0', '--comments', '5'),
+        )
+        for args in cases:
+            with self.subTest(args=args):
+                with self.assertRaises(CommandError):
+                    call_command('seed_data', '--scale', 'tiny', *args,
+                                 stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+
+    def test_follows_are_unique_pairs_up_to_count(self):
+        out = StringIO()
+        # 6 пар на троих; без групп посты создаются без группы
+        call_command('seed_data', '--users', '3', '--groups', '0',
+                     '--posts', '5', '--follows', '6', '--comments', '0',
+                     stdout=out)
+        self.assertEqual(Follow.objects.count(), 6)
+        self.assertFalse(Post.objects.exclude(group=None).exists())
+        self.assertNotIn('меньше', out.getvalue())
+
+    def test_seed_data_command(self):
+        out = StringIO()
+        call_command('seed_data', '--scale', 'tiny', '--posts', '100',
+                     '--batch-size', '30', stdout=out)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(User.objects.count(), seeding.SCALES['tiny']['users'])
+        self.assertIn('строк в минуту', out.getvalue())
+        # Повторный запуск добавляет новых пользователей, а не падает
+        call_command('seed_data', '--scale', 'tiny', '--posts', '10',
+                     stdout=StringIO())
+        self.assertEqual(User.objects.count(),
+                         2 * seeding.SCALES['tiny']['users'])
+
+    def test_seed_purges_cached_pages(self):
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='пост до заполнения', author=author)
+        url = reverse('posts:index')
+        self.assertEqual(Client().get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(Client().get(url)['X-Page-Cache'], 'HIT')
+        seeding.seed(users=5, groups=1, posts=20, follows=5, comments=5)
+        response = Client().get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_seed_fills_counters_and_timelines(self):
+        counts = seeding.seed(**seeding.SCALES['tiny'])
+        self.assertEqual(counts['posts'], Post.objects.count())
+        self.assertEqual(counts['follows'], Follow.objects.count())
+        # Даты заданы генератором, а не временем вставки
+        self.assertEqual(Post.objects.order_by('pub_date').first().pub_date,
+                         seeding.START)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user_id,
+                                         author=follow.author_id).count(),
+            Post.objects.filter(author=follow.author_id).count(),
+        )
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seeding.seed(**seeding.SCALES['tiny'])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scenarios_cover_posts_urls(self):
+        scenarios = benchmark.build_scenarios()
+        resolver = get_resolver()
+        names = {resolver.resolve(scenario.url.split('?')[0]).url_name
+                 for scenario in scenarios}
+        self.assertEqual(names, {pattern.name for pattern in urlpatterns})
+        counts = (Post.objects.count(), Comment.objects.count(),
+                  Follow.objects.count())
+        results = benchmark.run(scenarios, iterations=2, warmup=0)
+        # Сценарии записи убирают за собой: база не растет от прогонов
+        self.assertEqual((Post.objects.count(), Comment.objects.count(),
+                          Follow.objects.count()), counts)
+        self.assertEqual(set(results), {s.name for s in scenarios})
+        for result in results.values():
+            self.assertGreater(result['queries'], 0)
+        # Память своя у каждого сценария, а не общий пик процесса
+        self.assertGreater(len({result['peak_mb']
+                                for result in results.values()}), 1)
+
+    def test_compare_reports_regressions(self):
+        baseline = {'index': {'p95_ms': 10, 'queries': 2}}
+        self.assertEqual(benchmark.compare(
+            {'index': {'p95_ms': 11, 'queries': 2}}, baseline, 0.2), [])
+        self.assertEqual(len(benchmark.compare(
+            {'index': {'p95_ms': 13, 'queries': 3}}, baseline, 0.2)), 2)
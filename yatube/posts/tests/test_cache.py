@@ -1,10 +1,18 @@
+import time
+from http import HTTPStatus
+from io import StringIO
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase
 from django.urls import reverse
+from django.utils.http import http_date
 
-from posts.models import Post   # isort:skip
+from posts import counters  # isort:skip
+from posts.cache import get_or_refresh  # isort:skip
+from posts.models import (  # isort:skip
+    Comment, Counter, Follow, Group, Post)
 
 User = get_user_model()
 
@@ -21,13 +29,270 @@ class CacheTests(TestCase):
             author=cls.first_user
         )
 
-    def test_cashe_index(self):
-        text_post = CacheTests.post_without_group.text
+    def setUp(self):
+        cache.clear()
+
+    def get_index(self):
         response = self.authorized_client_1.get(reverse('posts:index'))
-        CacheTests.post_without_group.delete()
-        self.assertIn(text_post, response.content.decode('utf-8'))
-        page_obj = response.context.get('page_obj')
-        key = make_template_fragment_key('index_page', [page_obj.number])
-        cache.delete(key)
+        return response.content.decode('utf-8')
+
+    def test_index_is_served_from_cache(self):
+        text_post = CacheTests.post_without_group.text
+        self.assertIn(text_post, self.get_index())
+        # update() не отправляет сигналы: фрагмент остается в кэше
+        Post.objects.filter(pk=CacheTests.post_without_group.pk).update(
+            text='тихая правка')
+        self.assertIn(text_post, self.get_index())
+
+    def test_cached_index_keeps_switcher_for_viewer(self):
+        Client().get(reverse('posts:index'))
+        self.assertIn('Избранные авторы', self.get_index())
+
+    def test_post_delete_invalidates_index(self):
+        post = Post.objects.create(text='пост на удаление',
+                                   author=CacheTests.first_user)
+        self.assertIn(post.text, self.get_index())
+        post.delete()
+        self.assertNotIn(post.text, self.get_index())
+
+    def test_post_create_invalidates_index(self):
+        self.get_index()
+        Post.objects.create(text='свежий пост', author=CacheTests.first_user)
+        self.assertIn('свежий пост', self.get_index())
+
+    def test_related_changes_bump_generation(self):
+        generations = [self.get_generation()]
+        Comment.objects.create(text='комментарий',
+                               post=CacheTests.post_without_group,
+                               author=CacheTests.first_user)
+        generations.append(self.get_generation())
+        Group.objects.create(title='Группа', slug='group',
+                             description='Описание')
+        generations.append(self.get_generation())
+        self.assertEqual(len(set(generations)), len(generations))
+
+    def get_generation(self):
         response = self.authorized_client_1.get(reverse('posts:index'))
-        self.assertNotIn(text_post, response.content.decode('utf-8'))
+        return response.context['generation']
+
+    def test_post_card_is_cached_until_edit(self):
+        post = CacheTests.post_without_group
+        url = reverse('posts:profile', args=(CacheTests.first_user.username,))
+        self.authorized_client_1.get(url)
+        Post.objects.filter(pk=post.pk).update(text='тихая правка')
+        response = self.authorized_client_1.get(url)
+        self.assertIn(post.text, response.content.decode('utf-8'))
+        self.authorized_client_1.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            data={'text': 'правка через форму'},
+        )
+        response = self.authorized_client_1.get(url)
+        self.assertIn('правка через форму', response.content.decode('utf-8'))
+
+    def test_post_card_follows_author_and_group_changes(self):
+        author = User.objects.create_user(username='writer',
+                                          first_name='Иван')
+        group = Group.objects.create(title='Группа', slug='old-slug',
+                                     description='Описание')
+        Post.objects.create(text='пост автора', author=author, group=group)
+        Follow.objects.create(user=CacheTests.first_user, author=author)
+        url = reverse('posts:follow_index')
+        content = self.authorized_client_1.get(url).content.decode('utf-8')
+        self.assertIn('Иван', content)
+        self.assertIn('/group/old-slug/', content)
+        author.first_name = 'Петр'
+        author.save()
+        group.slug = 'new-slug'
+        group.save()
+        content = self.authorized_client_1.get(url).content.decode('utf-8')
+        self.assertIn('Петр', content)
+        self.assertIn('/group/new-slug/', content)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+
+    def revalidate(self, client, url, etag):
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_modified(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=('author',)),
+            reverse('posts:post_detail', args=(ConditionalGetTests.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.revalidate(self.client, url, etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_new_post_changes_etag(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='новый пост',
+                            author=ConditionalGetTests.author)
+        response = self.revalidate(self.client, url, etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_validators_follow_own_page(self):
+        url = reverse('posts:profile', args=('author',))
+        response = self.client.get(url)
+        # Пост другого автора на этой странице не виден
+        Post.objects.create(text='чужой пост',
+                            author=ConditionalGetTests.reader)
+        self.assertEqual(
+            self.revalidate(self.client, url, response['ETag']).status_code,
+            HTTPStatus.NOT_MODIFIED)
+        detail = reverse('posts:post_detail',
+                         args=(ConditionalGetTests.post.pk,))
+        etag = self.client.get(detail)['ETag']
+        comment = Comment.objects.create(
+            post=ConditionalGetTests.post,
+            author=ConditionalGetTests.reader, text='комментарий')
+        response = self.revalidate(self.client, detail, etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        comment.delete()
+        self.assertEqual(
+            self.revalidate(self.client, detail, etag).status_code,
+            HTTPStatus.OK)
+
+    def test_deleted_post_is_not_hidden_by_if_modified_since(self):
+        url = reverse('posts:index')
+        post = Post.objects.create(text='пост на удаление',
+                                   author=ConditionalGetTests.author)
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        post.delete()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn(post.text, response.content.decode('utf-8'))
+
+    def test_follow_changes_profile_etag(self):
+        url = reverse('posts:profile', args=('author',))
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=ConditionalGetTests.reader,
+                              author=ConditionalGetTests.author)
+        response = self.revalidate(self.reader_client, url, etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_viewer_and_page_change_etag(self):
+        url = reverse('posts:index')
+        anonymous = self.client.get(url)
+        reader = self.reader_client.get(url)
+        self.assertNotEqual(anonymous['ETag'], reader['ETag'])
+        self.assertNotEqual(anonymous['ETag'],
+                            self.client.get(url, {'page': 2})['ETag'])
+        self.assertIn('public', anonymous['Cache-Control'])
+        self.assertIn('private', reader['Cache-Control'])
+        self.assertIn('Cookie', anonymous['Vary'])
+
+
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'значение {self.calls}'
+
+    def test_fresh_value_is_not_recomputed(self):
+        get_or_refresh('key', self.compute, 60, version=1)
+        self.assertEqual(get_or_refresh('key', self.compute, 60, version=1),
+                         'значение 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_is_served_while_other_worker_refreshes(self):
+        get_or_refresh('key', self.compute, 0)
+        # блокировку держит другой обработчик
+        cache.add('key:lock', 1)
+        self.assertEqual(get_or_refresh('key', self.compute, 0),
+                         'значение 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_is_refreshed_by_lock_owner(self):
+        get_or_refresh('key', self.compute, 60, version=1)
+        # новое поколение делает значение устаревшим
+        self.assertEqual(get_or_refresh('key', self.compute, 60, version=2),
+                         'значение 2')
+        self.assertIsNone(cache.get('key:lock'))
+
+
+class WarmCacheTests(TestCase):
+    def test_feeds_are_rendered_into_cache(self):
+        author = User.objects.create_user(username='active')
+        group = Group.objects.create(title='Группа', slug='warm',
+                                     description='Описание')
+        Post.objects.create(text='пост', author=author, group=group)
+        cache.clear()
+        out = StringIO()
+        call_command('warm_cache', '--workers', '1', '--host', 'testserver',
+                     stdout=out, stderr=StringIO())
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=('warm',)),
+                    reverse('posts:profile', args=('active',))):
+            with self.subTest(url=url):
+                self.assertIn(f'мс  {url}\n', out.getvalue())
+                self.assertEqual(Client().get(url)['X-Page-Cache'], 'HIT')
+
+    def test_profiles_without_counters_are_warmed(self):
+        author = User.objects.create_user(username='uncounted')
+        Post.objects.create(text='пост', author=author)
+        # Счетчик еще не заводили
+        Counter.objects.all().delete()
+        cache.clear()
+        out = StringIO()
+        call_command('warm_cache', '--workers', '1', '--host', 'testserver',
+                     '--profiles', '1', stdout=out, stderr=StringIO())
+        url = reverse('posts:profile', args=('uncounted',))
+        self.assertIn(f'мс  {url}\n', out.getvalue())
+
+
+class WarmCacheWorkersTests(TransactionTestCase):
+    # Потоки читают базу своими соединениями: данные должны быть
+    # закоммичены
+    def test_pages_are_rendered_by_several_workers(self):
+        author = User.objects.create_user(username='active')
+        for number in range(3):
+            Group.objects.create(title=f'Группа {number}',
+                                 slug=f'warm-{number}',
+                                 description='Описание')
+        Post.objects.create(text='пост', author=author)
+        # Общая база в памяти блокирует таблицу на запись для других
+        # соединений без ожидания (busy_timeout тут не работает):
+        # счетчики, которые страницы заводят при первом чтении, создаются
+        # заранее, одним потоком
+        for group_id in Group.objects.values_list('id', flat=True):
+            counters.get(counters.GROUP_POSTS, group_id)
+        counters.get_many((counters.AUTHOR_POSTS, author.id),
+                          (counters.FOLLOWERS, author.id),
+                          (counters.FOLLOWING, author.id))
+        counters.get(counters.ALL_POSTS)
+        cache.clear()
+        out = StringIO()
+        call_command('warm_cache', '--workers', '4', '--host', 'testserver',
+                     stdout=out, stderr=StringIO())
+        self.assertIn('Страниц: 7,', out.getvalue())
+        statuses = [line.split()[0] for line in out.getvalue().splitlines()
+                    if 'мс  ' in line]
+        self.assertEqual(statuses, ['200'] * 7)
+        for number in range(3):
+            url = reverse('posts:group_list', args=(f'warm-{number}',))
+            with self.subTest(url=url):
+                self.assertIn(f'мс  {url}\n', out.getvalue())
+                self.assertEqual(Client().get(url)['X-Page-Cache'], 'HIT')
@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts import counters  # isort:skip
+from posts.models import Comment, Counter, Follow, Group, Post  # isort:skip
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounter(self, name, object_id, expected):
+        self.assertEqual(counters.get(name, object_id), expected)
+        self.assertEqual(counters.live_count(name, object_id), expected)
+
+    def test_posts_are_counted(self):
+        post = Post.objects.create(text='пост', author=CounterTests.author,
+                                   group=CounterTests.group)
+        Post.objects.create(text='еще пост', author=CounterTests.author)
+        self.assertCounter(counters.AUTHOR_POSTS, CounterTests.author.id, 2)
+        self.assertCounter(counters.GROUP_POSTS, CounterTests.group.id, 1)
+        self.assertCounter(counters.ALL_POSTS, 0, 2)
+        post.group = CounterTests.other_group
+        post.save()
+        self.assertCounter(counters.GROUP_POSTS, CounterTests.group.id, 0)
+        self.assertCounter(
+            counters.GROUP_POSTS, CounterTests.other_group.id, 1)
+        post.delete()
+        self.assertCounter(counters.AUTHOR_POSTS, CounterTests.author.id, 1)
+        self.assertCounter(
+            counters.GROUP_POSTS, CounterTests.other_group.id, 0)
+
+    def test_comments_and_follows_are_counted(self):
+        post = Post.objects.create(text='пост', author=CounterTests.author)
+        comment = Comment.objects.create(text='комментарий', post=post,
+                                         author=CounterTests.reader)
+        Comment.objects.create(text='еще', post=post,
+                               author=CounterTests.author)
+        comment.delete()
+        self.assertCounter(counters.POST_COMMENTS, post.id, 1)
+        follow = Follow.objects.create(user=CounterTests.reader,
+                                       author=CounterTests.author)
+        self.assertCounter(counters.FOLLOWERS, CounterTests.author.id, 1)
+        self.assertCounter(counters.FOLLOWING, CounterTests.reader.id, 1)
+        follow.delete()
+        self.assertCounter(counters.FOLLOWERS, CounterTests.author.id, 0)
+
+    def test_recount_repairs_counters(self):
+        Post.objects.create(text='пост', author=CounterTests.author)
+        # bulk_create не отправляет сигналы
+        Post.objects.bulk_create(
+            Post(text=f'пост {num}', author=CounterTests.author)
+            for num in range(3)
+        )
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, CounterTests.author.id), 1)
+        call_command('recount', stdout=StringIO())
+        self.assertCounter(counters.AUTHOR_POSTS, CounterTests.author.id, 4)
+        self.assertCounter(counters.ALL_POSTS, 0, 4)
+        self.assertFalse(Counter.objects.filter(
+            name=counters.GROUP_POSTS).exists())
+
+    def test_change_applies_delta_to_existing_or_new_counter(self):
+        counters.change(counters.AUTHOR_POSTS, CounterTests.reader.id, 5)
+        # Строки не было: значение — живой COUNT(*)
+        self.assertCounter(counters.AUTHOR_POSTS, CounterTests.reader.id, 0)
+        counters.change(counters.AUTHOR_POSTS, CounterTests.reader.id, 2)
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, CounterTests.reader.id), 2)
+
+    def test_new_post_does_not_read_previous_values(self):
+        Post.objects.create(text='пост', author=CounterTests.author,
+                            group=CounterTests.group)
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.create(text='еще пост',
+                                       author=CounterTests.author,
+                                       group=CounterTests.group)
+        self.assertFalse([query for query in queries
+                          if query['sql'].startswith('SELECT')
+                          and 'FROM "posts_post"' in query['sql']])
+        post.text = 'правка текста'
+        post.save(update_fields=['text'])
+        self.assertCounter(counters.GROUP_POSTS, CounterTests.group.id, 2)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -84,8 +85,10 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(checked_post.text, form_data['text'])
         self.assertEqual(checked_post.group, self.group)
         self.assertEqual(checked_post.author, self.first_user)
+        # картинка хранится по хешу содержимого
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertEqual(checked_post.image.name,
-                         f'posts/{form_data["image"].name}')
+                         f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif')
 
     def test_edit_post(self):
         small_gif = (
@@ -124,8 +127,10 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(checked_post.text, form_data['text'])
         self.assertEqual(checked_post.group, self.group)
         self.assertEqual(checked_post.author, self.first_user)
+        # картинка хранится по хешу содержимого
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertEqual(checked_post.image.name,
-                         f'posts/{form_data["image"].name}')
+                         f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif')
 
     def test_redirects_not_auth_user(self):
         count = Post.objects.all().count()
@@ -0,0 +1,23 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+
+class QueryPlanTests(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по индексам, без сортировки в B-дереве."""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('follow_index', out.getvalue())
+
+    def test_missing_search_triggers_are_reported(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_ai')
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, 'search index'):
+            call_command('check_query_plans', stdout=out)
+        self.assertIn('posts_post_fts_ai', out.getvalue())
+        call_command('rebuild_search_index', stdout=StringIO())
+        call_command('check_query_plans', stdout=StringIO())
@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search  # isort:skip
+from posts.models import Post  # isort:skip
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='someone')
+        cls.post = Post.objects.create(
+            text='Кошка <b>сидит</b> на окне', author=cls.user)
+        Post.objects.bulk_create(
+            Post(text=f'котики номер {num}', author=cls.user)
+            for num in range(5)
+        )
+        Post.objects.create(text='про собак', author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        return self.guest_client.get(reverse('posts:search'),
+                                     {'q': query, **params})
+
+    def test_search_highlights_and_escapes(self):
+        response = self.search('КОШКА')
+        self.assertEqual(response.context['posts'], [SearchTests.post])
+        content = response.content.decode('utf-8')
+        self.assertIn('<mark>Кошка</mark>', content)
+        self.assertIn('&lt;b&gt;сидит&lt;/b&gt;', content)
+
+    def test_search_follows_post_changes(self):
+        post = Post.objects.create(text='Пес лежит', author=SearchTests.user)
+        self.assertEqual(self.search('пес').context['posts'], [post])
+        post.text = 'Попугай летает'
+        post.save()
+        self.assertEqual(self.search('пес').context['posts'], [])
+        self.assertEqual(self.search('попугай').context['posts'], [post])
+        post.delete()
+        self.assertEqual(self.search('попугай').context['posts'], [])
+
+    def test_search_cursor_pagination(self):
+        found, cursor = search.search('котики', 2)
+        while cursor:
+            posts, cursor = search.search('котики', 2, cursor)
+            found.extend(posts)
+        self.assertEqual(len(found), 5)
+        self.assertEqual(len(set(found)), 5)
+        response = self.search('котики')
+        self.assertIsNone(response.context['next_query'])
+
+    def test_search_ignores_query_syntax(self):
+        response = self.search('"кошка* (')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['posts'], [SearchTests.post])
+
+    def test_rebuild_search_index(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('котики').context['posts']), 5)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'})
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,129 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts.models import Post  # isort:skip
+from posts.storage import post_image_storage  # isort:skip
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def upload(name):
+    return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class HashedStorageTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Отметки claim из других тестов: там транзакция не фиксируется
+        cache.clear()
+        self.user = User.objects.create_user(username='uploader')
+
+    def test_same_content_is_stored_once(self):
+        first = Post.objects.create(text='первый', author=self.user,
+                                    image=upload('first.gif'))
+        second = Post.objects.create(text='второй', author=self.user,
+                                     image=upload('Second.GIF'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+
+    def test_file_is_removed_with_last_post(self):
+        first = Post.objects.create(text='первый', author=self.user,
+                                    image=upload('first.gif'))
+        second = Post.objects.create(text='второй', author=self.user,
+                                     image=upload('second.gif'))
+        name = first.image.name
+        first.delete()
+        self.assertTrue(post_image_storage.exists(name))
+        second.delete()
+        self.assertFalse(post_image_storage.exists(name))
+
+    def test_claimed_file_survives_release(self):
+        first = Post.objects.create(text='первый', author=self.user,
+                                    image=upload('first.gif'))
+        name = first.image.name
+        # Та же картинка загружена, но пост с ней еще не сохранен
+        self.assertEqual(post_image_storage.save('posts/again.gif',
+                                                 ContentFile(SMALL_GIF)),
+                         name)
+        first.delete()
+        self.assertTrue(post_image_storage.exists(name))
+        second = Post.objects.create(text='второй', author=self.user,
+                                     image=name)
+        self.assertFalse(post_image_storage.is_claimed(name))
+        second.delete()
+        self.assertFalse(post_image_storage.exists(name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DedupeImagesTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_existing_copies_are_merged(self):
+        user = User.objects.create_user(username='old_uploader')
+        plain_storage = FileSystemStorage()
+        names = [plain_storage.save(f'posts/old_{number}.gif',
+                                    ContentFile(SMALL_GIF))
+                 for number in range(2)]
+        posts = [Post.objects.create(text=name, author=user)
+                 for name in names]
+        for post, name in zip(posts, names):
+            Post.objects.filter(pk=post.pk).update(image=name)
+        out = StringIO()
+        call_command('dedupe_images', stdout=out)
+        self.assertIn('Перенесено: 1, удалено дубликатов: 1', out.getvalue())
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        target = images.pop()
+        self.assertTrue(post_image_storage.exists(target))
+        for name in names:
+            self.assertFalse(plain_storage.exists(name))
+        # Повторный запуск: файлы уже на своих адресах
+        out = StringIO()
+        call_command('dedupe_images', stdout=out)
+        self.assertIn('Перенесено: 0, удалено дубликатов: 0', out.getvalue())
+        self.assertEqual(set(Post.objects.values_list('image', flat=True)),
+                         {target})
+
+    def test_misplaced_hashed_file_moves_to_fixed_root(self):
+        user = User.objects.create_user(username='nested_uploader')
+        target = Post.objects.create(text='пост', author=user,
+                                     image=upload('nested.gif')).image.name
+        # Так картинку раскладывал прежний dedupe_images при повторе
+        nested = target.replace('posts/', 'posts/' + target[6:12], 1)
+        FileSystemStorage().save(nested, ContentFile(SMALL_GIF))
+        post = Post.objects.create(text='вложенный', author=user)
+        Post.objects.filter(pk=post.pk).update(image=nested)
+        call_command('dedupe_images', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, target)
+        self.assertFalse(post_image_storage.exists(nested))
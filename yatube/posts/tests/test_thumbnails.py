@@ -0,0 +1,193 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails  # isort:skip
+from posts.models import Post, ThumbnailJob  # isort:skip
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='someone')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_thumbnail_is_generated_by_worker(self):
+        post = Post.objects.create(
+            text='пост с картинкой',
+            author=ThumbnailTests.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'),
+        )
+        self.assertTrue(ThumbnailJob.objects.filter(
+            image=post.image.name).exists())
+        url = reverse('posts:post_detail', args=(post.pk,))
+        # пока задание в очереди, показывается оригинал
+        response = self.guest_client.get(url)
+        self.assertIn(post.image.url, response.content.decode('utf-8'))
+        call_command('thumbnail_worker', '--once', stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exists())
+        response = self.guest_client.get(url)
+        content = response.content.decode('utf-8')
+        self.assertNotIn(post.image.url, content)
+        self.assertIn(settings.MEDIA_URL + 'cache/', content)
+        self.assertIn('loading="lazy"', content)
+        for width in settings.POST_THUMBNAIL_WIDTHS:
+            self.assertIn(f' {width}w', content)
+
+    @override_settings(POST_THUMBNAIL_WIDTHS=(320, 640, 1920),
+                       POST_THUMBNAIL_FORMATS=('NOSUCHFORMAT', 'JPEG'))
+    def test_variants_keep_ratio_and_supported_formats(self):
+        variants = thumbnails.variants('card')
+        self.assertEqual(
+            [(format_, width, geometry)
+             for format_, width, geometry, _ in variants],
+            [('JPEG', 320, '320x113'), ('JPEG', 640, '640x226')],
+        )
+        self.assertEqual(variants[0][3]['format'], 'JPEG')
+
+    def test_regenerate_thumbnails_with_process_pool(self):
+        posts = [
+            Post.objects.create(
+                text=f'пост {number}',
+                author=ThumbnailTests.user,
+                # разное содержимое — иначе картинки совпадут по хешу
+                image=SimpleUploadedFile(f'pool_{number}.gif',
+                                         SMALL_GIF + bytes([number]),
+                                         content_type='image/gif'),
+            )
+            for number in range(3)
+        ]
+        state_file = os.path.join(TEMP_MEDIA_ROOT, 'state')
+        out = StringIO()
+        call_command('regenerate_thumbnails', '--workers', '2',
+                     '--chunk-size', '2', '--state-file', state_file,
+                     stdout=out)
+        self.assertIn('Картинок: 3 (ошибок: 0)', out.getvalue())
+        self.assertFalse(os.path.exists(state_file))
+        self.assertFalse(ThumbnailJob.objects.exists())
+        for post in posts:
+            self.assertIsNotNone(thumbnails.ready(post.image, 'card'))
+        # Повторный проход: файлы уже есть, посты не трогаются
+        updated = list(Post.objects.order_by('id').values_list(
+            'updated', flat=True))
+        out = StringIO()
+        call_command('regenerate_thumbnails', '--workers', '0', stdout=out)
+        self.assertIn('Картинок: 3 (ошибок: 0), миниатюр: 0,',
+                      out.getvalue())
+        self.assertEqual(list(Post.objects.order_by('id').values_list(
+            'updated', flat=True)), updated)
+        self.assertFalse(os.path.exists(os.path.join(
+            TEMP_MEDIA_ROOT, '.regenerate_thumbnails')))
+
+    def test_regenerate_thumbnails_resumes_from_state(self):
+        names = [
+            Post.objects.create(
+                text=f'пост {number}',
+                author=ThumbnailTests.user,
+                image=SimpleUploadedFile(f'resume_{number}.gif',
+                                         SMALL_GIF + bytes([10 + number]),
+                                         content_type='image/gif'),
+            ).image
+            for number in range(2)
+        ]
+        names.sort(key=lambda image: image.name)
+        state_file = os.path.join(TEMP_MEDIA_ROOT, 'resume_state')
+        with open(state_file, 'w', encoding='utf-8') as state:
+            state.write(names[0].name)
+        call_command('regenerate_thumbnails', '--workers', '0',
+                     '--state-file', state_file, stdout=StringIO())
+        self.assertIsNone(thumbnails.ready(names[0], 'card'))
+        self.assertIsNotNone(thumbnails.ready(names[1], 'card'))
+
+    def test_failed_job_is_kept_and_retried_later(self):
+        job = ThumbnailJob.objects.create(image='posts/missing.gif')
+        out = StringIO()
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            call_command('thumbnail_worker', '--once', stdout=out)
+        self.assertIn('Обработано картинок: 0, отложено: 1', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('missing.gif', job.last_error)
+        self.assertGreater(job.next_attempt, timezone.now())
+        # Пока пауза не прошла, задание не выбирается
+        self.assertEqual(thumbnails.due_jobs(10), [])
+        ThumbnailJob.objects.filter(pk=job.pk).update(
+            next_attempt=timezone.now(),
+            attempts=settings.THUMBNAIL_JOB_MAX_ATTEMPTS - 1)
+        with self.assertLogs('posts.thumbnails', 'ERROR') as logs:
+            thumbnails.process(thumbnails.due_jobs(10))
+        self.assertIn('больше не повторяется', logs.output[-1])
+        self.assertEqual(thumbnails.due_jobs(10), [])
+        self.assertTrue(ThumbnailJob.objects.filter(pk=job.pk).exists())
+
+    def test_exhausted_job_is_retried_when_enqueued_again(self):
+        post = Post.objects.create(
+            text='пост с картинкой',
+            author=ThumbnailTests.user,
+            image=SimpleUploadedFile('retry.gif', SMALL_GIF + b'\x02',
+                                     content_type='image/gif'),
+        )
+        ThumbnailJob.objects.filter(image=post.image.name).update(
+            attempts=settings.THUMBNAIL_JOB_MAX_ATTEMPTS,
+            last_error='ошибка')
+        self.assertEqual(thumbnails.due_jobs(10), [])
+        thumbnails.enqueue(post)
+        job = ThumbnailJob.objects.get(image=post.image.name)
+        self.assertEqual((job.attempts, job.last_error), (0, ''))
+        self.assertEqual(thumbnails.due_jobs(10), [job])
+
+    def test_picture_is_cached_per_post_version(self):
+        post = Post.objects.create(
+            text='пост с картинкой',
+            author=ThumbnailTests.user,
+            image=SimpleUploadedFile('cached.gif', SMALL_GIF + b'\x01',
+                                     content_type='image/gif'),
+        )
+        call_command('thumbnail_worker', '--once', stdout=StringIO())
+        post.refresh_from_db()
+        version = post.updated.isoformat()
+        url, variants = thumbnails.picture(post.image, 'card', version)
+        self.assertIsNotNone(url)
+        self.assertEqual(set(variants), set(thumbnails.supported_formats()))
+        # Записи kvstore больше не читаются, пока версия поста та же
+        default.kvstore.delete_thumbnails(ImageFile(post.image.name))
+        self.assertEqual(
+            thumbnails.picture(post.image, 'card', version)[0], url)
+        self.assertIsNone(
+            thumbnails.picture(post.image, 'card', 'new-version')[0])
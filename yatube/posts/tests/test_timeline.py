@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import (  # isort:skip
+    Follow, Post, TimelineEntry, TimelineJob)
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other_reader = User.objects.create_user(username='other')
+        cls.old_post = Post.objects.create(text='старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(TimelineTests.reader)
+
+    def follow(self, user):
+        return Follow.objects.create(user=user, author=TimelineTests.author)
+
+    def test_follow_backfills_timeline(self):
+        self.follow(TimelineTests.reader)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTests.reader, post=TimelineTests.old_post).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        self.follow(TimelineTests.reader)
+        post = Post.objects.create(text='новый пост',
+                                   author=TimelineTests.author)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_unfollow_trims_only_own_timeline(self):
+        self.follow(TimelineTests.reader)
+        self.follow(TimelineTests.other_reader)
+        self.client.get(reverse('posts:profile_unfollow',
+                                args=(TimelineTests.author.username,)))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=TimelineTests.reader).exists())
+        self.assertTrue(Follow.objects.filter(
+            user=TimelineTests.other_reader).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTests.other_reader).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_on_read(self):
+        self.follow(TimelineTests.reader)
+        post = Post.objects.create(text='пост популярного автора',
+                                   author=TimelineTests.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_crossing_fanout_limit(self):
+        self.follow(TimelineTests.reader)
+        other_follow = self.follow(TimelineTests.other_reader)
+        # Подписчиков больше предела: пост не раскладывается по лентам
+        pulled = Post.objects.create(text='пост в режиме pull',
+                                     author=TimelineTests.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=pulled).exists())
+        # Пост другого автора из материализованной ленты
+        other_author = User.objects.create_user(username='other_author')
+        Follow.objects.create(user=TimelineTests.reader, author=other_author)
+        pushed = Post.objects.create(text='пост из ленты',
+                                     author=other_author)
+        entries = TimelineEntry.objects.count()
+        response = self.client.get(reverse('posts:follow_index'))
+        # Ленты слиты по дате, история автора целиком, записей нет
+        self.assertEqual(list(response.context['page_obj']),
+                         [pushed, pulled, TimelineTests.old_post])
+        self.assertEqual(TimelineEntry.objects.count(), entries)
+        # Подписчиков снова не больше предела: отписка только ставит
+        # задание, до его выполнения посты читаются из Post
+        other_follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(post=pulled).exists())
+        self.assertTrue(TimelineJob.objects.filter(
+            author=TimelineTests.author).exists())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [pushed, pulled, TimelineTests.old_post])
+        call_command('timeline_worker', '--once', stdout=StringIO())
+        self.assertFalse(TimelineJob.objects.exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTests.reader, post=pulled).exists())
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=TimelineTests.reader, author=TimelineTests.author).count(),
+            2)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [pushed, pulled, TimelineTests.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0, PAGINATOR_SHALLOW_PAGES=1)
+    def test_pulled_feed_pages_by_cursor(self):
+        self.follow(TimelineTests.reader)
+        posts = [Post.objects.create(text=f'пост {number}',
+                                     author=TimelineTests.author)
+                 for number in range(12)]
+        url = reverse('posts:follow_index')
+        page_obj = self.client.get(url).context['page_obj']
+        seen = list(page_obj)
+        while page_obj.next_query:
+            page_obj = self.client.get(
+                f'{url}?{page_obj.next_query}').context['page_obj']
+            seen.extend(page_obj)
+        self.assertTrue(page_obj.is_cursor)
+        self.assertEqual(seen, [*reversed(posts), TimelineTests.old_post])
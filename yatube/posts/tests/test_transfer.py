@@ -0,0 +1,114 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import counters, transfer  # isort:skip
+from posts.models import (  # isort:skip
+    Comment, Counter, Follow, Group, Post, TimelineEntry)
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='transfer',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='пост в группе',
+                                       author=cls.author, group=cls.group)
+        Post.objects.create(text='пост без группы', author=cls.reader)
+        Comment.objects.create(text='комментарий', post=cls.post,
+                               author=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self):
+        output = StringIO()
+        transfer.export(output, chunk_size=1)
+        return output.getvalue()
+
+    def test_round_trip_into_empty_database(self):
+        dump = self.export()
+        self.assertEqual(len(dump.splitlines()), 5)
+        pub_date = self.post.pub_date
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.all().delete()
+        created = transfer.load(dump.splitlines(), batch_size=1)
+        self.assertEqual(created, {'users': 2, 'groups': 1, 'posts': 2,
+                                   'follows': 1, 'comments': 1})
+        post = Post.objects.get(text='пост в группе')
+        self.assertEqual(post.author.username, 'author')
+        self.assertEqual(post.group.slug, 'transfer')
+        # Даты переносятся, а не ставятся временем загрузки
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        self.assertEqual(counters.get(counters.FOLLOWERS, post.author_id), 1)
+        self.assertTrue(post.author.following.filter(
+            user__username='reader').exists())
+        self.assertTrue(post.timeline_entries.exists())
+
+    def test_import_remaps_post_ids(self):
+        dump = self.export()
+        created = transfer.load(dump.splitlines())
+        # Группы и подписки уже есть, посты и комментарии — копии
+        self.assertEqual(created, {'users': 0, 'groups': 0, 'posts': 2,
+                                   'follows': 0, 'comments': 1})
+        copy = Post.objects.exclude(pk=self.post.pk).get(
+            text='пост в группе')
+        self.assertNotEqual(copy.pk, self.post.pk)
+        self.assertEqual(copy.comments.get().text, 'комментарий')
+        self.assertEqual(self.post.comments.count(), 1)
+
+    def test_import_updates_only_touched_counters_and_feeds(self):
+        dump = self.export()
+        # Несвязанный с импортом счетчик не пересчитывается
+        Counter.objects.update_or_create(
+            name=counters.FOLLOWERS, object_id=self.reader.pk,
+            defaults={'value': 42})
+        transfer.load(dump.splitlines(), batch_size=1)
+        copy = Post.objects.exclude(pk=self.post.pk).get(
+            text='пост в группе')
+        self.assertEqual(counters.get(counters.FOLLOWERS, self.reader.pk),
+                         42)
+        self.assertEqual(counters.get(counters.ALL_POSTS), 4)
+        self.assertEqual(
+            counters.get(counters.AUTHOR_POSTS, self.author.pk), 2)
+        self.assertEqual(counters.get(counters.GROUP_POSTS, self.group.pk),
+                         2)
+        self.assertEqual(counters.get(counters.POST_COMMENTS, copy.pk), 1)
+        # Копия поста попала в ленту подписчика автора
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=copy).exists())
+
+    def test_follow_import_purges_both_profiles(self):
+        cache.clear()
+        follower = User.objects.create_user(username='follower')
+        urls = [reverse('posts:profile', args=(username,))
+                for username in ('follower', 'author')]
+        for url in urls:
+            Client().get(url)
+            self.assertEqual(Client().get(url)['X-Page-Cache'], 'HIT')
+        transfer.load([json.dumps({'model': transfer.FOLLOW,
+                                   'user': follower.username,
+                                   'author': self.author.username})])
+        for url in urls:
+            with self.subTest(url=url):
+                response = Client().get(url)
+                self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual(counters.get(counters.FOLLOWING, follower.pk), 1)
+
+    def test_command_rejects_unknown_rows(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as dump:
+            dump.write('{"model": "user", "username": "x"}\n')
+            dump.flush()
+            with self.assertRaisesMessage(CommandError, 'Строка 1'):
+                call_command('import_content', dump.name, stdout=StringIO())
@@ -0,0 +1,93 @@
+import shutil
+import struct
+import tempfile
+import zlib
+from http import HTTPStatus
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post  # isort:skip
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def png_header(width, height):
+    """Только заголовок: картинка огромная лишь на словах."""
+    return (b'\x89PNG\r\n\x1a\n'
+            + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                             8, 2, 0, 0, 0))
+            + png_chunk(b'IDAT', zlib.compress(b'\0' * 64)))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BoundedUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(BoundedUploadTests.user)
+
+    def post_image(self, content):
+        return self.client.post(reverse('posts:post_create'), data={
+            'text': 'пост с картинкой',
+            'image': SimpleUploadedFile('picture.png', content,
+                                        content_type='image/png'),
+        })
+
+    def assertRejected(self, response, message):
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(message, response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_too_many_bytes(self):
+        self.assertRejected(self.post_image(png(100, 100) + b'\0' * 200),
+                            'Размер файла больше')
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels(self):
+        self.assertRejected(self.post_image(png(20, 10)),
+                            'Картинка 20×10')
+
+    def test_decompression_bomb_rejected_by_header(self):
+        self.assertRejected(self.post_image(png_header(100000, 100000)),
+                            'Картинка больше 40 Мп')
+
+    def test_image_within_limits(self):
+        response = self.post_image(png(20, 10))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+
+    def test_csrf_is_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(BoundedUploadTests.user)
+        response = client.post(reverse('posts:post_create'),
+                               data={'text': 'без токена'})
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
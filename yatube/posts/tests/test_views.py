@@ -3,12 +3,15 @@ import tempfile
 
 from django import forms
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import InvalidPage, Page
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Group, Post, Follow   # isort:skip
+from posts.paginators import BEFORE, CursorPaginator  # isort:skip
 from yatube.settings import PAGE_COUNT  # isort:skip
 User = get_user_model()
 
@@ -341,6 +344,8 @@ class PaginatorTests(TestCase):
         Post.objects.bulk_create(posts)
 
     def setUp(self):
+        # страницы для анонимов кэшируются целиком (core/page_cache.py)
+        cache.clear()
         # Создаем авторизованный клиент
         self.user = PaginatorTests.user
         self.authorized_client = Client()
@@ -422,3 +427,97 @@ class PaginatorTests(TestCase):
                                    + f'?page={count_of_pages + 1}')
         self.assertEqual(len(response.context.get('page_obj')),
                          posts_on_last_page)
+
+    # Проверяем переход по курсору: все посты без повторов и пропусков
+    @override_settings(PAGINATOR_SHALLOW_PAGES=2)
+    def test_cursor_pagination(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        page_obj = response.context.get('page_obj')
+        seen = list(page_obj)
+        pages = [list(page_obj)]
+        while page_obj.next_query:
+            response = self.client.get(url + '?' + page_obj.next_query)
+            page_obj = response.context.get('page_obj')
+            seen.extend(page_obj)
+            pages.append(list(page_obj))
+        self.assertTrue(page_obj.is_cursor)
+        self.assertEqual(seen, list(Post.objects.order_by('-pub_date', '-id')))
+        # Возврат к более новым записям отдает предыдущую страницу
+        response = self.client.get(url + '?' + page_obj.previous_query)
+        self.assertEqual(list(response.context.get('page_obj')), pages[-2])
+
+    # Страница по курсору отвечает на методы Page без номера страницы
+    def test_cursor_page_methods(self):
+        paginator = CursorPaginator(Post.objects.all(), PAGE_COUNT)
+        posts = list(Post.objects.order_by('-pub_date', '-id'))
+        page = paginator.cursor_page(paginator.encode_cursor(posts[0]))
+        self.assertIsInstance(page, Page)
+        self.assertTrue(page.has_next())
+        self.assertTrue(page.has_previous())
+        self.assertTrue(page.has_other_pages())
+        self.assertIsNone(page.start_index())
+        self.assertIsNone(page.end_index())
+        with self.assertRaises(InvalidPage):
+            page.next_page_number()
+        # Последняя страница: дальше идти некуда
+        last = paginator.cursor_page(
+            paginator.encode_cursor(posts[-PAGE_COUNT - 1]))
+        self.assertEqual(list(last), posts[-PAGE_COUNT:])
+        self.assertFalse(last.has_next())
+        self.assertIsNone(last.next_query)
+        # Самая новая запись: новее ничего нет
+        first = paginator.cursor_page(
+            paginator.encode_cursor(posts[PAGE_COUNT]), BEFORE)
+        self.assertEqual(list(first), posts[:PAGE_COUNT])
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?after=broken')
+        page_obj = response.context.get('page_obj')
+        self.assertFalse(page_obj.is_cursor)
+        self.assertEqual(page_obj.number, 1)
+
+
+# Число запросов на страницу ленты не зависит от числа постов
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for num in range(PAGE_COUNT):
+            author = User.objects.create_user(username=f'author_{num}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(text=f'post_num {num}', author=author,
+                                group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueriesTests.reader)
+
+    def test_feed_query_count(self):
+        author = User.objects.get(username='author_0')
+        # сессия и пользователь для авторизованного клиента; у страниц
+        # с ETag еще агрегат валидаторов (posts/conditional.py)
+        pages = {
+            reverse('posts:index'): (self.client, 3),
+            reverse('posts:group_list',
+                    args=(FeedQueriesTests.group.slug,)): (self.client, 4),
+            reverse('posts:profile',
+                    args=(author.username,)): (self.client, 4),
+            reverse('posts:follow_index'): (self.authorized_client, 5),
+        }
+        for url, (client, queries) in pages.items():
+            with self.subTest(url=url):
+                # первый запрос заводит счетчики (posts/counters.py)
+                client.get(url)
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    client.get(url)
@@ -0,0 +1,291 @@
+"""Заблаговременная генерация миниатюр картинок постов.
+
+При сохранении поста с картинкой в очередь ThumbnailJob попадает
+задание, и фоновый обработчик (`manage.py thumbnail_worker`) создает
+миниатюры всех размеров из POST_THUMBNAILS. Кроме основных размеров
+создаются адаптивные варианты разной ширины и формата (WebP и JPEG) —
+браузер выбирает из srcset самый легкий подходящий. Пока миниатюры нет,
+шаблон показывает оригинал — первый читатель нового поста не ждет, пока Pillow
+уменьшит картинку прямо внутри запроса.
+"""
+import hashlib
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from .cache import bump_generation, purge_post_pages
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_options(source, options):
+    """Опции так же, как их дополняет sorl в get_thumbnail()."""
+    backend = default.backend
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(name, geometry, options):
+    source = ImageFile(name)
+    options = thumbnail_options(source, options)
+    thumbnail_name = default.backend._get_thumbnail_filename(
+        source, geometry, options)
+    return ImageFile(thumbnail_name, default.storage)
+
+
+def ready(image, alias):
+    """Готовая миниатюра из key-value хранилища sorl или None."""
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    return default.kvstore.get(thumbnail_file(image.name, geometry, options))
+
+
+def supported_formats():
+    """Форматы из POST_THUMBNAIL_FORMATS, которые умеет сохранять Pillow.
+
+    WebP, например, доступен только если Pillow собран с libwebp.
+    """
+    Image.init()
+    return [format_ for format_ in settings.POST_THUMBNAIL_FORMATS
+            if format_ in Image.SAVE]
+
+
+def variants(alias):
+    """Адаптивные варианты миниатюры для srcset.
+
+    Пропорции берутся из геометрии POST_THUMBNAILS[alias], ширины — из
+    POST_THUMBNAIL_WIDTHS (не шире самой миниатюры). Возвращает список
+    (формат, ширина, геометрия, опции).
+    """
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    width, height = (int(side) for side in geometry.split('x'))
+    result = []
+    for format_ in supported_formats():
+        for variant_width in settings.POST_THUMBNAIL_WIDTHS:
+            if variant_width > width:
+                continue
+            variant_height = round(height * variant_width / width)
+            result.append((
+                format_,
+                variant_width,
+                f'{variant_width}x{variant_height}',
+                dict(options, format=format_),
+            ))
+    return result
+
+
+def geometries():
+    """Все миниатюры картинки поста: основные и адаптивные варианты."""
+    for alias, (geometry, options) in settings.POST_THUMBNAILS.items():
+        yield geometry, options
+        for _, _, variant_geometry, variant_options in variants(alias):
+            yield variant_geometry, variant_options
+
+
+def ready_variants(image, alias):
+    """Готовые варианты миниатюры: {формат: [(ширина, URL), ...]}."""
+    result = {}
+    for format_, width, geometry, options in variants(alias):
+        thumbnail = default.kvstore.get(
+            thumbnail_file(image.name, geometry, options))
+        if thumbnail is not None:
+            result.setdefault(format_, []).append((width, thumbnail.url))
+    return result
+
+
+def picture(image, alias, version):
+    """Миниатюра и ее варианты для <picture> одним чтением из кэша.
+
+    Возвращает (URL миниатюры или None, результат ready_variants()).
+    Без кэша это 1 + len(variants(alias)) обращений к kvstore на каждую
+    картинку страницы. version — Post.updated: refresh_posts() меняет
+    его, когда миниатюры готовы, поэтому запись «миниатюр еще нет»
+    не переживает их появления.
+    """
+    digest = hashlib.md5(
+        f'{image.name}|{alias}|{version}'.encode()).hexdigest()
+    key = f'post_picture:{digest}'
+    cached = cache.get(key)
+    if cached is None:
+        thumbnail = ready(image, alias)
+        cached = (thumbnail and thumbnail.url,
+                  ready_variants(image, alias))
+        cache.set(key, cached, settings.CARD_CACHE_TIMEOUT)
+    return cached
+
+
+def render(name, force=False):
+    """Создает файлы миниатюр всех размеров для одной картинки.
+
+    Годится для дочернего процесса: оригинал открывается один раз,
+    а key-value хранилище sorl и база не используются. Возвращает
+    размер оригинала, пары (имя миниатюры, размер) для store() и число
+    действительно созданных файлов (уже существующие не пересоздаются
+    без force).
+    """
+    engine = default.engine
+    source = ImageFile(name, default.storage)
+    source_image = engine.get_image(source)
+    try:
+        source.set_size(engine.get_image_size(source_image))
+        rendered = []
+        created = 0
+        for geometry, options in geometries():
+            thumbnail = thumbnail_file(name, geometry, options)
+            if force or not thumbnail.exists():
+                # FileSystemStorage не перезаписывает файл, а переименовывает
+                thumbnail.delete()
+                options = thumbnail_options(source, options)
+                options['image_info'] = engine.get_image_info(source_image)
+                default.backend._create_thumbnail(
+                    source_image, geometry, options, thumbnail)
+                default.backend._create_alternative_resolutions(
+                    source_image, geometry, options, thumbnail.name)
+                created += 1
+            thumbnail.set_size()
+            rendered.append((thumbnail.name, thumbnail.size))
+        return source.size, rendered, created
+    finally:
+        engine.cleanup(source_image)
+
+
+def store(rendered):
+    """Записывает результаты render() в key-value хранилище sorl.
+
+    `rendered` — словарь {картинка: результат render()}; все записи
+    идут одной транзакцией, задания этих картинок убираются из очереди.
+    Возвращает картинки, миниатюры которых изменились: созданы файлы
+    или картинки еще не было в хранилище. Их посты нужно обновить
+    refresh_posts().
+    """
+    kvstore = default.kvstore
+    changed = []
+    with transaction.atomic():
+        for name, (size, thumbnails, created) in rendered.items():
+            source = ImageFile(name, default.storage)
+            if created or kvstore.get(source) is None:
+                changed.append(name)
+            source.set_size(size)
+            kvstore.set(source)
+            for thumbnail_name, thumbnail_size in thumbnails:
+                thumbnail = ImageFile(thumbnail_name, default.storage)
+                thumbnail.set_size(thumbnail_size)
+                kvstore.set(thumbnail, source)
+        ThumbnailJob.objects.filter(image__in=list(rendered)).delete()
+    return changed
+
+
+def refresh_posts(images, chunk_size=500):
+    """Обновляет посты с картинками images: карточки и фрагменты
+    с оригиналом картинки больше не нужны. Поколение кэша лент
+    увеличивается один раз на весь вызов."""
+    images = list(images)
+    if not images:
+        return
+    now = timezone.now()
+    for start in range(0, len(images), chunk_size):
+        chunk = images[start:start + chunk_size]
+        Post.objects.filter(image__in=chunk).update(updated=now)
+        for post in Post.objects.filter(
+                image__in=chunk).select_related('author'):
+            purge_post_pages(post)
+    bump_generation()
+
+
+def release(name):
+    """Удаляет файл картинки вместе с миниатюрами, если ни один пост
+    на него больше не ссылается (одинаковые картинки хранятся одним
+    файлом, см. posts/storage.py)."""
+    if not name or Post.objects.filter(image=name).exists():
+        return False
+    storage = Post._meta.get_field('image').storage
+    try:
+        # Сначала файл уходит со своего адреса, и только потом проверка
+        # повторяется: загрузка той же картинки после переноса запишет
+        # файл заново, а загрузка до него видна по отметке claim
+        detached = storage.detach(name)
+        if (storage.is_claimed(name)
+                or Post.objects.filter(image=name).exists()):
+            if detached is not None:
+                storage.restore(detached, name)
+            return False
+        # Записи в kvstore и файлы миниатюр, затем сам файл
+        default.backend.delete(ImageFile(name, storage), delete_file=False)
+        if detached is not None:
+            storage.delete(detached)
+    except Exception:
+        # Неудачная уборка файла не должна ломать удаление поста
+        logger.exception('Не удалось удалить картинку %s', name)
+        return False
+    ThumbnailJob.objects.filter(image=name).delete()
+    return True
+
+
+def enqueue(post):
+    """Ставит картинку поста в очередь. Задание, у которого кончились
+    попытки, начинается заново: картинку загрузили снова."""
+    if not post.image:
+        return
+    job, created = ThumbnailJob.objects.get_or_create(image=post.image.name)
+    if not created and job.attempts >= settings.THUMBNAIL_JOB_MAX_ATTEMPTS:
+        job.attempts = 0
+        job.last_error = ''
+        job.next_attempt = timezone.now()
+        job.save(update_fields=['attempts', 'last_error', 'next_attempt'])
+
+
+def due_jobs(limit):
+    """Задания, которые пора выполнить: новые и отложенные повторы."""
+    return list(ThumbnailJob.objects.filter(
+        next_attempt__lte=timezone.now(),
+        attempts__lt=settings.THUMBNAIL_JOB_MAX_ATTEMPTS,
+    )[:limit])
+
+
+def fail(job, error):
+    """Откладывает задание после неудачи; пауза растет вдвое."""
+    job.attempts += 1
+    job.last_error = error
+    job.next_attempt = timezone.now() + timedelta(
+        seconds=settings.THUMBNAIL_JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+    job.save(update_fields=['attempts', 'last_error', 'next_attempt'])
+    if job.attempts >= settings.THUMBNAIL_JOB_MAX_ATTEMPTS:
+        logger.error('Миниатюры для %s не созданы за %d попыток, '
+                     'задание больше не повторяется', job.image, job.attempts)
+
+
+def process(jobs):
+    """Создает миниатюры для заданий и возвращает число выполненных.
+
+    Миниатюры создаются через render(): get_thumbnail() sorl глотает
+    ошибки чтения оригинала, и неудача была бы не видна. Выполненные
+    задания убирает store(), неудачные остаются с текстом ошибки
+    и повторяются позже (см. due_jobs).
+    """
+    rendered = {}
+    for job in jobs:
+        try:
+            rendered[job.image] = render(job.image)
+        except Exception:
+            logger.exception('Не удалось создать миниатюры для %s', job.image)
+            fail(job, traceback.format_exc())
+    refresh_posts(store(rendered))
+    return len(rendered)
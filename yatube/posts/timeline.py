@@ -0,0 +1,268 @@
+"""Лента подписок с разветвлением при записи (fan-out-on-write).
+
+Новый пост сразу раскладывается по лентам подписчиков автора, поэтому
+чтение `/follow/` — это один диапазон по индексу `(user, pub_date)`.
+Посты авторов, у которых подписчиков больше TIMELINE_FANOUT_LIMIT,
+не раскладываются при записи, а читаются из Post при чтении ленты
+и сливаются с материализованной частью (FollowFeed). Чтение ленты
+ничего не пишет в базу.
+
+Когда подписчиков снова становится не больше предела, посты автора
+раскладываются по лентам в фоне (TimelineJob, `manage.py
+timeline_worker`), а до тех пор читаются из Post.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import counters
+from .models import Counter, Follow, Post, TimelineEntry, TimelineJob
+
+# Порядок записей ленты для CursorPaginator
+ORDERING = ('-pub_date', '-post_id')
+
+
+def _create_entries(entries):
+    entries = iter(entries)
+    batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+
+
+def is_pull_author(author_id):
+    followers = counters.get(counters.FOLLOWERS, author_id)
+    return followers > settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    fan_out_many([post])
+
+
+def fan_out_many(posts):
+    """fan_out() для нескольких новых постов: подписчики каждого автора
+    читаются один раз на все его посты."""
+    by_author = {}
+    for post in posts:
+        by_author.setdefault(post.author_id, []).append(post)
+    for author_id, author_posts in by_author.items():
+        if is_pull_author(author_id):
+            continue
+        follower_ids = Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True)
+        _create_entries(
+            TimelineEntry(user_id=user_id, post_id=post.id,
+                          author_id=author_id, pub_date=post.pub_date)
+            for user_id in follower_ids.iterator()
+            for post in author_posts
+        )
+
+
+def materialize(author_id, user_ids):
+    """Раскладывает все посты автора по лентам пользователей user_ids."""
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'))
+    _create_entries(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for user_id in user_ids
+        for post_id, pub_date in posts
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту всю историю автора после подписки."""
+    if not is_pull_author(author_id):
+        materialize(author_id, [user_id])
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def leave_pull_mode(author_id):
+    """Ставит в очередь раскладку постов автора по лентам всех
+    подписчиков, когда подписчиков снова стало TIMELINE_FANOUT_LIMIT.
+
+    Пока автор был в режиме pull, его новые посты в ленты не попадали,
+    а новые подписчики не получали историю. Это до TIMELINE_FANOUT_LIMIT
+    лент по всей истории автора, поэтому работа не делается в запросе
+    отписки: ее выполняет process(), а пока задание ждет, лента читает
+    посты автора из Post. Вызывается после уменьшения счетчика
+    подписчиков.
+    """
+    followers = counters.get(counters.FOLLOWERS, author_id)
+    if followers != settings.TIMELINE_FANOUT_LIMIT:
+        return
+    TimelineJob.objects.get_or_create(author_id=author_id)
+
+
+def due_jobs(limit):
+    return list(TimelineJob.objects.all()[:limit])
+
+
+def process(jobs):
+    """Раскладывает посты авторов из заданий по лентам подписчиков
+    одним запросом INSERT ... SELECT на автора и возвращает число
+    выполненных заданий.
+
+    Записи, которые остались в лентах с режима push, не дублируются.
+    Если подписчиков снова больше предела, задание просто снимается.
+    """
+    for job in jobs:
+        with transaction.atomic():
+            if not is_pull_author(job.author_id):
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'INSERT INTO posts_timelineentry '
+                        '(user_id, post_id, author_id, pub_date) '
+                        'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+                        'FROM posts_follow f JOIN posts_post p '
+                        'ON p.author_id = f.author_id '
+                        'WHERE f.author_id = %s AND NOT EXISTS ('
+                        '  SELECT 1 FROM posts_timelineentry t'
+                        '  WHERE t.user_id = f.user_id AND t.post_id = p.id'
+                        ') ORDER BY f.user_id, p.pub_date DESC, p.id DESC',
+                        [job.author_id],
+                    )
+            job.delete()
+    return len(jobs)
+
+
+def pull_authors(user):
+    """id авторов из подписок user, посты которых читаются из Post:
+    в режиме pull и ожидающих раскладки по лентам (TimelineJob)."""
+    followed = Follow.objects.filter(user=user).values('author_id')
+    popular = Counter.objects.filter(
+        name=counters.FOLLOWERS,
+        object_id__in=followed,
+        value__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('object_id', flat=True)
+    pending = TimelineJob.objects.filter(
+        author_id__in=followed).order_by().values_list('author_id', flat=True)
+    return list(popular.union(pending))
+
+
+class FollowFeed:
+    """Лента, слитая из двух источников: записей TimelineEntry и постов
+    авторов в режиме pull.
+
+    Ведет себя для CursorPaginator как queryset TimelineEntry: каждый
+    источник читается отдельным запросом по ключу `(pub_date, post_id)`
+    с тем же условием курсора и пределом, результаты сливаются по ключу,
+    а посты страницы читаются еще одним запросом. Записи авторов,
+    перешедших в режим pull, остаются в таблице и здесь пропускаются.
+    """
+
+    model = TimelineEntry
+    ordered = True
+
+    def __init__(self, user_id, entries, pulled, posts, ordering=ORDERING):
+        self.user_id = user_id
+        self.entries = entries
+        self.pulled = pulled
+        self.posts = posts
+        self.ordering = tuple(ordering)
+
+    def _clone(self, **changes):
+        state = dict(user_id=self.user_id, entries=self.entries,
+                     pulled=self.pulled, posts=self.posts,
+                     ordering=self.ordering)
+        state.update(changes)
+        return FollowFeed(**state)
+
+    def order_by(self, *ordering):
+        return self._clone(ordering=ordering)
+
+    def reverse(self):
+        return self._clone(ordering=tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering))
+
+    def filter(self, *args, **kwargs):
+        return self._clone(entries=self.entries.filter(*args, **kwargs),
+                           pulled=self.pulled.filter(*args, **kwargs))
+
+    def count(self):
+        return self.entries.count() + self.pulled.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.step:
+            raise TypeError('FollowFeed поддерживает только срезы')
+        start = item.start or 0
+        keys = [
+            part.order_by(*self.ordering).values_list(
+                'pub_date', 'post_id')[:item.stop]
+            for part in (self.entries, self.pulled)
+        ]
+        merged = list(islice(
+            heapq.merge(*keys, reverse=self.ordering[0].startswith('-')),
+            start, item.stop))
+        posts = self.posts.in_bulk([post_id for _, post_id in merged])
+        return [
+            TimelineEntry(user_id=self.user_id, post=posts[post_id],
+                          author_id=posts[post_id].author_id,
+                          pub_date=pub_date)
+            for pub_date, post_id in merged if post_id in posts
+        ]
+
+
+def feed(user, entries, posts):
+    """Лента подписок user для CursorPaginator.
+
+    entries — записи TimelineEntry пользователя, posts — queryset
+    с нужными select_related/only, которым FollowFeed читает посты
+    страницы. Если авторов в режиме pull в подписках нет, лента — это
+    просто entries.
+    """
+    pulled = pull_authors(user)
+    if not pulled:
+        return entries
+    return FollowFeed(
+        user.id,
+        entries.exclude(author_id__in=pulled),
+        Post.objects.filter(author_id__in=pulled).annotate(post_id=F('id')),
+        posts,
+    )
+
+
+def rebuild(backfill_size=None, fanout_limit=None):
+    """Заново заполняет ленты: посты каждого автора всем подписчикам.
+
+    То же, что backfill() для каждой подписки, но одним запросом —
+    нужно после bulk_create, который обходит сигналы. backfill_size
+    ограничивает число последних постов автора (по умолчанию — все).
+    Авторов с подписчиками больше fanout_limit лента читает из Post,
+    как и после fan_out. Счетчики должны быть пересчитаны.
+    """
+    if fanout_limit is None:
+        fanout_limit = settings.TIMELINE_FANOUT_LIMIT
+    position = ''
+    params = [counters.FOLLOWERS, fanout_limit]
+    if backfill_size is not None:
+        position = 'AND p.position <= %s '
+        params.insert(0, backfill_size)
+    TimelineEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO posts_timelineentry '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            'FROM posts_follow f JOIN ('
+            '  SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            '    PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            '  ) AS position FROM posts_post'
+            ') p ON p.author_id = f.author_id '
+            + position
+            + 'WHERE f.author_id NOT IN ('
+            '  SELECT object_id FROM posts_counter'
+            '  WHERE name = %s AND value > %s'
+            # В порядке индекса (user, pub_date): вставка заметно быстрее
+            ') ORDER BY f.user_id, p.pub_date DESC, p.id DESC',
+            params,
+        )
@@ -0,0 +1,219 @@
+"""Потоковые выгрузка и загрузка контента в NDJSON.
+
+Одна строка — один объект: сначала группы, потом посты, комментарии
+и подписки. Пользователи указываются по username, группы по slug,
+поэтому файл переносится между базами. Выгрузка читает таблицы через
+iterator() кусками, загрузка пишет bulk_create пачками: память не
+зависит от размера таблиц.
+
+Посты получают новые id со сдвигом на наибольший id в базе
+(`id + offset`), поэтому комментарии находят свои посты без словаря
+соответствий. bulk_create обходит сигналы, поэтому каждая пачка сама
+пересчитывает счетчики объектов, которых коснулась, и раскладывает
+новые посты по лентам подписчиков, а новые подписки получают историю
+автора — как сделали бы сигналы. Остальные счетчики и ленты не
+трогаются. Файлы картинок не переносятся — только их имена.
+"""
+import json
+from itertools import groupby, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from core import page_cache
+
+from . import bulk, counters, seeding, timeline
+from .cache import bump_generation
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+GROUP = 'group'
+POST = 'post'
+COMMENT = 'comment'
+FOLLOW = 'follow'
+
+
+def chunked(values, size):
+    values = iter(values)
+    chunk = list(islice(values, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(values, size))
+
+
+def export_rows(chunk_size=2000):
+    groups = Group.objects.order_by('id').values_list(
+        'slug', 'title', 'description')
+    for slug, title, description in groups.iterator(chunk_size):
+        yield {'model': GROUP, 'slug': slug, 'title': title,
+               'description': description}
+    posts = Post.objects.order_by('id').values_list(
+        'id', 'author__username', 'group__slug', 'text', 'image',
+        'pub_date', 'updated')
+    for post_id, author, group, text, image, pub_date, updated in (
+            posts.iterator(chunk_size)):
+        yield {'model': POST, 'id': post_id, 'author': author,
+               'group': group, 'text': text, 'image': image,
+               'pub_date': pub_date.isoformat(),
+               'updated': updated.isoformat()}
+    comments = Comment.objects.order_by('id').values_list(
+        'post_id', 'author__username', 'text', 'created')
+    for post_id, author, text, created in comments.iterator(chunk_size):
+        yield {'model': COMMENT, 'post': post_id, 'author': author,
+               'text': text, 'created': created.isoformat()}
+    follows = Follow.objects.order_by('id').values_list(
+        'user__username', 'author__username')
+    for user, author in follows.iterator(chunk_size):
+        yield {'model': FOLLOW, 'user': user, 'author': author}
+
+
+def export(stream, chunk_size=2000):
+    """Пишет контент в stream и возвращает число строк по моделям."""
+    written = {GROUP: 0, POST: 0, COMMENT: 0, FOLLOW: 0}
+    for row in export_rows(chunk_size):
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        written[row['model']] += 1
+    return written
+
+
+def lookup(queryset, field, values):
+    """{значение: id} для values; `__in` дробится под лимит параметров."""
+    found = {}
+    size = connection.features.max_query_params or len(values) or 1
+    for chunk in chunked(set(values), size):
+        found.update(queryset.filter(
+            **{f'{field}__in': chunk}).values_list(field, 'id'))
+    return found
+
+
+def user_ids(usernames):
+    """id пользователей по username; недостающие создаются без пароля."""
+    found = lookup(User.objects.all(), 'username', usernames)
+    missing = set(usernames) - set(found)
+    if missing:
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=username, password=password)
+             for username in missing], ignore_conflicts=True)
+        found.update(lookup(User.objects.all(), 'username', missing))
+    return found
+
+
+def load_groups(rows, offset):
+    Group.objects.bulk_create(
+        [Group(slug=row['slug'], title=row['title'],
+               description=row['description']) for row in rows],
+        ignore_conflicts=True)
+
+
+def load_posts(rows, offset):
+    users = user_ids([row['author'] for row in rows])
+    groups = lookup(Group.objects.all(), 'slug',
+                    [row['group'] for row in rows if row['group']])
+    posts = Post.objects.bulk_create([
+        Post(id=row['id'] + offset,
+             author_id=users[row['author']],
+             group_id=groups.get(row['group']),
+             text=row['text'],
+             image=row.get('image') or '',
+             pub_date=parse_datetime(row['pub_date']),
+             updated=parse_datetime(row.get('updated') or row['pub_date']))
+        for row in rows])
+    # Ленты — подписчикам, которые уже есть в базе; подписки из файла
+    # получат посты в load_follows
+    bulk.posts_created(posts)
+
+
+def load_comments(rows, offset):
+    # Комментарии к постам, которых нет в базе, пропускаются
+    posts = lookup(Post.objects.all(), 'id',
+                   [row['post'] + offset for row in rows])
+    rows = [row for row in rows if row['post'] + offset in posts]
+    users = user_ids([row['author'] for row in rows])
+    Comment.objects.bulk_create(
+        Comment(post_id=row['post'] + offset,
+                author_id=users[row['author']],
+                text=row['text'],
+                created=parse_datetime(row['created']))
+        for row in rows)
+    counters.recount_many(counters.POST_COMMENTS, posts)
+    page_cache.purge(*(page_cache.page_path('posts:post_detail', post_id)
+                       for post_id in posts))
+
+
+def load_follows(rows, offset):
+    users = user_ids([row['user'] for row in rows]
+                     + [row['author'] for row in rows])
+    pairs = {(users[row['user']], users[row['author']])
+             for row in rows if row['user'] != row['author']}
+    existing = set(Follow.objects.filter(
+        user_id__in={user_id for user_id, _ in pairs},
+        author_id__in={author_id for _, author_id in pairs},
+    ).values_list('user_id', 'author_id'))
+    pairs -= existing
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs],
+        ignore_conflicts=True)
+    counters.recount_many(counters.FOLLOWERS,
+                          {author_id for _, author_id in pairs})
+    counters.recount_many(counters.FOLLOWING,
+                          {user_id for user_id, _ in pairs})
+    # Новые подписки получают историю автора, как после backfill()
+    followers = {}
+    for user_id, author_id in pairs:
+        followers.setdefault(author_id, []).append(user_id)
+    for author_id, follower_ids in followers.items():
+        if not timeline.is_pull_author(author_id):
+            timeline.materialize(author_id, follower_ids)
+    # Как сигнал Follow: меняются счетчики в профилях обеих сторон
+    usernames = {row[side] for row in rows for side in ('user', 'author')}
+    page_cache.purge(*(page_cache.page_path('posts:profile', username)
+                       for username in usernames))
+
+
+LOADERS = {
+    GROUP: load_groups,
+    POST: load_posts,
+    COMMENT: load_comments,
+    FOLLOW: load_follows,
+}
+
+
+def parse(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            raise ValueError(f'Строка {number}: {error}')
+        if row.get('model') not in LOADERS:
+            raise ValueError(
+                f'Строка {number}: неизвестная модель {row.get("model")!r}')
+        yield row
+
+
+def load(lines, batch_size=2000, log=None):
+    """Загружает контент из строк NDJSON и возвращает, сколько строк
+    создано по моделям. Каждая пачка — своя транзакция."""
+    log = log or (lambda message: None)
+    before = seeding.totals()
+    offset = Post.objects.aggregate(last=Max('id'))['last'] or 0
+    with seeding.manual_dates(Post._meta.get_field('pub_date'),
+                              Post._meta.get_field('updated'),
+                              Comment._meta.get_field('created')):
+        for model, rows in groupby(parse(lines), key=lambda row: row['model']):
+            read = 0
+            for batch in chunked(rows, batch_size):
+                with transaction.atomic():
+                    LOADERS[model](batch, offset)
+                read += len(batch)
+            log(f'{model}: {read}')
+    bump_generation()
+    return {name: count - before[name]
+            for name, count in seeding.totals().items()}
@@ -0,0 +1,99 @@
+"""Потоковая загрузка картинок постов с ограничениями.
+
+Стандартные обработчики держат файл до FILE_UPLOAD_MAX_MEMORY_SIZE в
+памяти, а проверка ImageField целиком открывает его Pillow. Здесь файл
+сразу пишется во временный файл, размер считается по мере приема, а
+ширина и высота читаются из заголовка картинки до декодирования —
+«бомба» в несколько гигапикселей отбрасывается по первым килобайтам.
+"""
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import (SkipFile,
+                                             TemporaryFileUploadHandler)
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+# Сколько первых байт файла копить для чтения заголовка картинки
+HEADER_BYTES = 256 * 1024
+INVALID_IMAGE = ('Загрузите правильное изображение. Файл, который вы '
+                 'загрузили, поврежден или не является изображением.')
+
+
+def image_size(header):
+    """Размер картинки по началу файла или None, если заголовка мало.
+
+    DecompressionBombError от Pillow пробрасывается: это заведомо
+    слишком большая картинка.
+    """
+    try:
+        with Image.open(BytesIO(header)) as image:
+            return image.size
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+class BoundedImageUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = bytearray()
+        self.checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            megabytes = settings.POST_IMAGE_MAX_BYTES / 1024 / 1024
+            self.reject(f'Размер файла больше {megabytes:g} МБ.')
+        if not self.checked:
+            self.header += raw_data[:HEADER_BYTES - len(self.header)]
+            self.check_header()
+        return super().receive_data_chunk(raw_data, start)
+
+    def check_header(self):
+        megapixels = settings.POST_IMAGE_MAX_PIXELS / 1000 / 1000
+        try:
+            size = image_size(bytes(self.header))
+        except Image.DecompressionBombError:
+            self.reject(f'Картинка больше {megapixels:g} Мп.')
+        if size is None:
+            # Маленький файл без заголовка отклонит сам ImageField
+            if len(self.header) >= HEADER_BYTES:
+                self.reject(INVALID_IMAGE)
+            return
+        self.checked = True
+        width, height = size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            self.reject(
+                f'Картинка {width}×{height} больше {megapixels:g} Мп.')
+
+    def reject(self, message):
+        if not hasattr(self.request, 'upload_errors'):
+            self.request.upload_errors = {}
+        self.request.upload_errors[self.field_name] = message
+        # Временный файл закроет парсер; остаток файла пропускается,
+        # остальные поля формы разбираются как обычно
+        raise SkipFile
+
+
+def errors(request):
+    """Ошибки загрузки по именам полей формы."""
+    return getattr(request, 'upload_errors', {})
+
+
+def bounded_uploads(view):
+    """Подключает BoundedImageUploadHandler к view.
+
+    Обработчики загрузки можно заменить только до чтения request.POST,
+    а CsrfViewMiddleware читает его раньше view, поэтому проверка CSRF
+    переносится внутрь.
+    """
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [BoundedImageUploadHandler(request)]
+        return csrf_protect(view)(request, *args, **kwargs)
+    return wrapper
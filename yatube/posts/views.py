@@ -1,72 +1,153 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
 
+from . import counters, feeds, search, timeline, uploadhandlers
+from .cache import get_generation
+from .conditional import conditional_page, request_cached
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
+from .paginators import paginator_func
 
-from yatube.settings import PAGE_COUNT  # isort:skip
+from yatube.settings import INDEX_CACHE_TIMEOUT, PAGE_COUNT  # isort:skip
 
 
-def paginator_func(request, object, count_post):
-    paginator = Paginator(object, count_post)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+User = get_user_model()
 
 
-User = get_user_model()
+@request_cached
+def index_page(request):
+    return paginator_func(request, feeds.index_feed(), PAGE_COUNT,
+                          count=counters.get(counters.ALL_POSTS))
 
 
+@conditional_page(index_page)
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = paginator_func(request, post_list, PAGE_COUNT)
+    page_obj = index_page(request)
     # Отдаем в словаре контекста
     context = {
         'page_obj': page_obj,
+        'generation': get_generation(),
+        'cache_timeout': INDEX_CACHE_TIMEOUT,
     }
     return render(request, 'posts/index.html', context)
 
 
-def group_posts(request, slug):
+@request_cached
+def group_state(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = paginator_func(request, posts, PAGE_COUNT)
+    posts = feeds.group_feed(group)
+    count = counters.get(counters.GROUP_POSTS, group.id)
+    return group, paginator_func(request, posts, PAGE_COUNT, count=count)
+
+
+def group_page(request, slug):
+    return group_state(request, slug)[1]
+
+
+def group_etag_parts(request, slug):
+    # Название и описание группы видны только в ее шапке
+    group = group_state(request, slug)[0]
+    return group.title, group.description
+
+
+@conditional_page(group_page, group_etag_parts)
+def group_posts(request, slug):
+    group, page_obj = group_state(request, slug)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'generation': get_generation(),
+        'cache_timeout': INDEX_CACHE_TIMEOUT,
     }
     return render(request, 'posts/group_list.html', context)
 
 
-def profile(request, username):
+@request_cached
+def profile_state(request, username):
+    """Автор, его счетчики и подписка зрителя."""
     author = get_object_or_404(User, username=username)
-    follow_user = request.user
-    posts = author.posts.all()
-    count = posts.count()
-    page_obj = paginator_func(request, posts, PAGE_COUNT)
-    following = False
-    if not follow_user.is_anonymous:
-        follow = Follow.objects.filter(author=author)
-        if follow.filter(user=follow_user).exists():
-            following = True
+    counts = counters.get_many(
+        (counters.AUTHOR_POSTS, author.id),
+        (counters.FOLLOWERS, author.id),
+        (counters.FOLLOWING, author.id),
+    )
+    following = (
+        request.user.is_authenticated
+        and Follow.objects.filter(
+            user=request.user, author=author).exists()
+    )
+    return author, counts, following
+
+
+@request_cached
+def profile_page(request, username):
+    author, counts, _ = profile_state(request, username)
+    return paginator_func(request, feeds.profile_feed(author), PAGE_COUNT,
+                          count=counts[0])
+
+
+def profile_etag_parts(request, username):
+    # Подписки видны в профиле, но посты страницы не меняют
+    author, counts, following = profile_state(request, username)
+    return (author.id, author.get_full_name(), *counts, following)
+
+
+@conditional_page(profile_page, profile_etag_parts)
+def profile(request, username):
+    author, counts, following = profile_state(request, username)
+    count, followers_count, following_count = counts
+    page_obj = profile_page(request, username)
     context = {
-        'posts': posts,
+        'posts': page_obj.object_list,
         'count': count,
+        'followers_count': followers_count,
+        'following_count': following_count,
         'page_obj': page_obj,
         'author': author,
         'following': following,
-        'follow_user': follow_user
+        'follow_user': request.user
     }
     return render(request, 'posts/profile.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search.search(query, PAGE_COUNT,
+                                       request.GET.get('after'))
+    next_query = None
+    if next_cursor:
+        next_query = urlencode({'q': query, 'after': next_cursor})
+    context = {
+        'query': query,
+        'posts': posts,
+        'next_query': next_query,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@request_cached
+def post_state(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id)
+    return post, counters.get(counters.AUTHOR_POSTS, post.author_id)
+
+
+def post_page(request, post_id):
+    return [post_state(request, post_id)[0]]
+
+
+def post_etag_parts(request, post_id):
+    # Число постов автора видно рядом с постом
+    return post_state(request, post_id)[1:]
+
+
+@conditional_page(post_page, post_etag_parts)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post, count = post_state(request, post_id)
     author = post.author
-    posts = author.posts
-    count = posts.count()
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
     form = CommentForm(request.POST or None)
     # Здесь код запроса к модели и создание словаря контекста
     context = {
@@ -79,9 +160,11 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@uploadhandlers.bounded_uploads
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    upload_errors=uploadhandlers.errors(request))
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
@@ -94,6 +177,7 @@ def post_create(request):
     return render(request, 'posts/create_post.html', context)
 
 
+@uploadhandlers.bounded_uploads
 @login_required
 def post_edit(request, post_id):
     edit_post = get_object_or_404(Post, id=post_id)
@@ -101,7 +185,8 @@ def post_edit(request, post_id):
     if request.user != edit_post.author:
         return redirect('posts:post_detail', edit_post.id)
     form = PostForm(request.POST or None,
-                    files=request.FILES or None, instance=edit_post)
+                    files=request.FILES or None, instance=edit_post,
+                    upload_errors=uploadhandlers.errors(request))
     if form.is_valid():
         form.save()
         return redirect('posts:post_detail', edit_post.id)
@@ -128,8 +213,10 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_func(request, post_list, PAGE_COUNT)
+    entries = feeds.follow_feed(request.user)
+    page_obj = paginator_func(request, entries, PAGE_COUNT,
+                              ordering=timeline.ORDERING)
+    page_obj.object_list = [entry.post for entry in page_obj]
     # Отдаем в словаре контекста
     context = {
         'page_obj': page_obj,
@@ -140,11 +227,9 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(
-        author=author).filter(user=request.user).exists()
-    # Подписаться на автора
-    if request.user != author and not follow:
-        Follow.objects.create(
+    # Подписаться на автора; повторную подписку не даст unique_follow
+    if request.user != author:
+        Follow.objects.get_or_create(
             user=request.user,
             author=author
         )
@@ -155,5 +240,5 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     # Дизлайк, отписка
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(author=author.id).delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',  # Приложение для регистрация и авторизация пользователей
     'django.contrib.contenttypes',
@@ -42,6 +43,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Замеры времени и запросов к базе (core/metrics.py)
+    'core.metrics.MetricsMiddleware',
+    # До сессий: анонимам страницы отдаются из кэша целиком
+    'core.page_cache.PageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,7 +60,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга (core/metrics.py)
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -65,6 +71,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache.cache_timeouts',
             ],
         },
     },
@@ -79,10 +86,26 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.getenv('SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+        # Соединение переиспользуется между запросами
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'OPTIONS': {
+            # Сколько секунд писатель ждет блокировку, прежде чем упасть
+            'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', 20)),
+        },
     }
 }
 
+# PRAGMA для каждого нового соединения (core/db.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    # Отрицательное значение — размер в КиБ
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -130,10 +153,75 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 PAGE_COUNT = 10
+# Сколько страниц доступно по номеру, дальше — переход по курсору
+PAGINATOR_SHALLOW_PAGES = 10
+# Лента подписок: авторы с большим числом подписчиков читаются при запросе
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BATCH_SIZE = 500
+# JSON API (api/): постов на странице по умолчанию и максимум для ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Сколько постов или комментариев можно создать одним запросом
+API_BATCH_MAX_ITEMS = 100
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Фрагмент главной сбрасывается сигналами, таймаут — страховка
+INDEX_CACHE_TIMEOUT = 60 * 60 * 6
+# Сколько устаревший фрагмент еще отдается, пока его пересчитывают,
+# и сколько живет блокировка пересчета (posts/cache.py)
+STALE_CACHE_TIMEOUT = 60 * 60
+STALE_CACHE_LOCK_TIMEOUT = 30
+# Доля замеряемых запросов (0 — замеры выключены) и границы
+# гистограммы времени ответа в мс; сводка — /metrics/ для персонала
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0))
+METRICS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Как часто процесс записывает накопленные замеры в кэш
+METRICS_FLUSH_INTERVAL = 10
+# Кэш страниц для анонимов: сбрасывается сигналами, таймаут — страховка
+PAGE_CACHE_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+)
+PAGE_CACHE_TIMEOUT = 60 * 10
+# Как часто процесс записывает в кэш накопленные попадания и промахи
+PAGE_CACHE_STATS_INTERVAL = 10
+# Карточка поста привязана к версии поста (Post.updated)
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Миниатюры картинок постов: имя -> (геометрия, опции sorl)
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Ограничения загрузки картинки поста: байты и пиксели (ширина × высота)
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Адаптивные варианты миниатюр для srcset: ширины и форматы по порядку
+# предпочтения (последний — запасной для старых браузеров)
+POST_THUMBNAIL_WIDTHS = (320, 640, 960)
+POST_THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+# Ширина картинки в раскладке страницы — атрибут sizes
+POST_THUMBNAIL_SIZES = '(max-width: 992px) 100vw, 960px'
+# Очередь миниатюр: число попыток и пауза перед первым повтором, с;
+# каждая следующая пауза вдвое длиннее
+THUMBNAIL_JOB_MAX_ATTEMPTS = 5
+THUMBNAIL_JOB_RETRY_DELAY = 60
+# Бэкенд кэша: locmem — свой у каждого процесса (по умолчанию), sqlite —
+# общий файл для всех процессов на хосте (core/cache.py), file, memcached
+# или полный путь к классу; CACHE_LOCATION — файл, каталог или адрес
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'core.cache.SQLiteCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache.sqlite3')
+            if CACHE_BACKEND == 'sqlite' else ''),
     }
 }
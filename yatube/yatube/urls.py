@@ -2,6 +2,7 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core import views as core_views
 from yatube import settings
 
 urlpatterns = [
@@ -9,7 +10,9 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('admin/', admin.site.urls),
     path('auth/', include('django.contrib.auth.urls')),
-    path('about/', include('about.urls', namespace='about')), ]
+    path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls', namespace='api')),
+    path('metrics/', core_views.metrics, name='metrics'), ]
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'